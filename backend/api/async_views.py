@@ -0,0 +1,81 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from .cache import conditional_response, get_response_key
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+JSON_ACCEPT = ('', '*/*', 'application/json')
+
+
+class CachedJSONResponse(HttpResponse):
+    def __init__(self, data, **kwargs):
+        super().__init__(
+            JSONRenderer().render(data),
+            content_type='application/json',
+            **kwargs
+        )
+        patch_vary_headers(self, ('Accept',))
+
+
+def is_cacheable(request):
+    accept = request.META.get('HTTP_ACCEPT', '').split(',')[0].split(';')[0]
+    return (
+        request.method == 'GET'
+        and 'HTTP_AUTHORIZATION' not in request.META
+        and 'format' not in request.GET
+        and accept.strip() in JSON_ACCEPT
+    )
+
+
+def render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+def get_cached(namespace, request):
+    if is_cacheable(request):
+        return cache.get(get_response_key(namespace, request))
+    return None
+
+
+def async_view(viewset, actions):
+    """Асинхронная точка входа для действий вьюсета.
+
+    Анонимный запрос, ответ на который уже лежит в кэше CachedResponseMixin,
+    не доходит до вьюсета. В Django 3.2 нет ни асинхронного ORM, ни
+    асинхронного кэша, поэтому и чтение кэша, и вьюсет выполняются через
+    sync_to_async, а не в цикле событий. Кэш читается вне общего потока
+    запросов к БД.
+    """
+    view = viewset.as_view(actions)
+
+    async def handler(request, *args, **kwargs):
+        cached = await sync_to_async(get_cached, thread_sensitive=False)(
+            viewset.cache_namespace, request
+        )
+        if cached is not None:
+            return conditional_response(request, cached, CachedJSONResponse)
+        return await sync_to_async(render)(view, request, *args, **kwargs)
+
+    handler.csrf_exempt = True
+    return handler
+
+
+tags_list = async_view(TagViewSet, {'get': 'list'})
+tags_detail = async_view(TagViewSet, {'get': 'retrieve'})
+ingredients_list = async_view(IngredientViewSet, {'get': 'list'})
+ingredients_detail = async_view(IngredientViewSet, {'get': 'retrieve'})
+recipes_list = async_view(
+    RecipeViewSet, {'get': 'list', 'post': 'create'}
+)
+recipes_detail = async_view(RecipeViewSet, {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
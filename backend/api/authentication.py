@@ -0,0 +1,49 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from .db_routers import use_primary
+
+TOKEN_KEY = 'auth_token:{}'
+USER_TOKEN_KEY = 'auth_token_user:{}'
+
+
+def token_cache_key(key):
+    return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def forget_user_token(user_id):
+    key = cache.get(USER_TOKEN_KEY.format(user_id))
+    if key is not None:
+        cache.delete_many((key, USER_TOKEN_KEY.format(user_id)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, запоминающий пользователя токена в кэше.
+
+    Запись сбрасывается после коммита удаления токена или сохранения
+    пользователя. Кэш должен быть общим для всех процессов (проверка
+    api.E001 в check --deploy), иначе отозванный токен примут другие
+    воркеры. Массовые QuerySet.update() сигналов не вызывают: такие
+    изменения (например, is_active=False) вступают в силу не позже чем
+    через TOKEN_CACHE_TIMEOUT секунд.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            with use_primary():
+                credentials = super().authenticate_credentials(key)
+            user = credentials[0]
+            cache.set_many({
+                cache_key: credentials,
+                USER_TOKEN_KEY.format(user.pk): cache_key,
+            }, settings.TOKEN_CACHE_TIMEOUT)
+        return credentials
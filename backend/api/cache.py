@@ -0,0 +1,88 @@
+import hashlib
+import json
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .db_routers import use_primary
+
+VERSION_KEY = 'api_cache_version:{}'
+RESPONSE_KEY = 'api_cache_response:{}:{}:{}'
+CHANGED_KEY = 'api_cache_changed:{}'
+
+
+def get_version(namespace):
+    return cache.get_or_set(VERSION_KEY.format(namespace), 1, None)
+
+
+def invalidate(*namespaces):
+    for namespace in namespaces:
+        key = VERSION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+        cache.set(
+            CHANGED_KEY.format(namespace), True,
+            settings.READ_YOUR_WRITES_WINDOW
+        )
+
+
+def get_response_key(namespace, request):
+    return RESPONSE_KEY.format(
+        namespace,
+        get_version(namespace),
+        hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    )
+
+
+def conditional_response(request, cached, response_class):
+    data, etag, last_modified = cached
+    response = response_class(data, headers={
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+    })
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response
+    )
+
+
+class CachedResponseMixin:
+    """Кэширует list/retrieve и отвечает 304 на условные GET-запросы."""
+
+    cache_namespace = None
+    cache_anonymous_only = False
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        if self.cache_anonymous_only and request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = get_response_key(self.cache_namespace, request)
+        cached = cache.get(key)
+        if cached is None:
+            recently_changed = cache.get(
+                CHANGED_KEY.format(self.cache_namespace)
+            )
+            with use_primary() if recently_changed else nullcontext():
+                response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            etag = quote_etag(hashlib.md5(json.dumps(
+                response.data, sort_keys=True, default=str
+            ).encode()).hexdigest())
+            cached = (response.data, etag, int(time.time()))
+            cache.set(key, cached, settings.API_CACHE_TIMEOUT)
+        return conditional_response(request, cached, Response)
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches, Tags.security, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Отзыв токенов должен сразу доходить до всех процессов.
+
+    CachedTokenAuthentication забывает пользователя токена только в кэше:
+    с кэшем внутри процесса остальные воркеры принимали бы отозванный
+    токен ещё TOKEN_CACHE_TIMEOUT секунд.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in settings.PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'{backend} не разделяется между процессами',
+        hint='Задайте общий CACHE_BACKEND, например PyMemcacheCache.',
+        id='api.E001',
+    )]
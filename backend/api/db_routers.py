@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_DB = 'default'
+
+replica = ContextVar('replica', default=None)
+
+
+@contextmanager
+def read_from(alias):
+    token = replica.set(alias)
+    try:
+        yield
+    finally:
+        replica.reset(token)
+
+
+def use_primary():
+    return read_from(None)
+
+
+class ReplicaRouter:
+    """Чтение с реплики, выбранной для запроса, запись — в основную БД.
+
+    Вне read_from (команды, фоновые потоки, небезопасные запросы) все
+    запросы идут в основную БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        return replica.get() or DEFAULT_DB
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB
@@ -1,10 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Ingredient, Recipe, Tag
 
 User = get_user_model()
 
+SEARCH_CONFIG = 'russian'
+
 
 class IngredientFilter(FilterSet):
     name = filters.CharFilter(lookup_expr='istartswith', field_name='name')
@@ -22,22 +26,51 @@ class RecipeFilter(FilterSet):
         method='is_in_shopping_cart_custom_filter'
     )
     tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='tags_custom_filter'
+    )
+    tags_all = filters.ModelMultipleChoiceFilter(
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='tags_all_custom_filter'
     )
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
+    search = filters.CharFilter(method='search_custom_filter')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'tags', 'author')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'tags', 'tags_all',
+            'author', 'search'
+        )
+
+    def filter_user_relation(self, queryset, relation, value):
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(**{f'{relation}__user': self.request.user})
 
     def is_favorited_custom_filter(self, queryset, name, value):
+        return self.filter_user_relation(queryset, 'favorites', value)
+
+    def is_in_shopping_cart_custom_filter(self, queryset, name, value):
+        return self.filter_user_relation(queryset, 'shopping_cart', value)
+
+    def tags_custom_filter(self, queryset, name, value):
         if value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(tag_ids__overlap=[tag.id for tag in value])
         return queryset
 
-    def is_in_shopping_cart_custom_filter(self, queryset, name, value):
+    def tags_all_custom_filter(self, queryset, name, value):
         if value:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(tag_ids__contains=[tag.id for tag in value])
         return queryset
+
+    def search_custom_filter(self, queryset, name, value):
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
@@ -0,0 +1,97 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .db_routers import use_primary
+
+
+class VersionedIndex:
+    """Индекс в памяти процесса с журналом изменений в общем кэше.
+
+    Каждое изменение увеличивает общую версию и кладёт в кэш запись под
+    её номером. Остальные процессы при следующем обращении применяют
+    пропущенные записи по порядку. Если процесс отстал больше чем на
+    INDEX_CHANGES_MAX_LAG версий или часть записей уже вытеснена, индекс
+    перестраивается из базы целиком.
+
+    Запись описывает итоговое состояние объекта, а не разницу, поэтому
+    её повторное применение ничего не меняет. Журнал доходит до других
+    воркеров только через общий кэш (memcached, см. CACHES).
+    """
+
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def apply(self, change):
+        raise NotImplementedError
+
+    def change_key(self, version):
+        return f'{self.version_key}:{version}'
+
+    def current_version(self):
+        # Начальная версия — время: после вытеснения ключа новая серия
+        # не совпадёт со старой, и все процессы перестроят индекс.
+        return cache.get_or_set(self.version_key, time.time_ns, None)
+
+    def build(self):
+        with self._lock:
+            version = self.current_version()
+            with use_primary():
+                self.load()
+            self._version = version
+
+    @property
+    def is_built(self):
+        return self._version is not None
+
+    def catch_up(self, version):
+        """Применяет записи журнала до version; False, если их не хватает."""
+        if self._version is None or not (
+            0 < version - self._version <= settings.INDEX_CHANGES_MAX_LAG
+        ):
+            return False
+        keys = [
+            self.change_key(number)
+            for number in range(self._version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        for key in keys:
+            self.apply(changes[key])
+        self._version = version
+        return True
+
+    def ensure_fresh(self):
+        with self._lock:
+            version = self.current_version()
+            if version != self._version and not self.catch_up(version):
+                self.build()
+
+    def publish(self, change):
+        """Записывает изменение в журнал и применяет его к своему индексу."""
+        with self._lock:
+            try:
+                version = cache.incr(self.version_key)
+            except ValueError:
+                self.invalidate()
+                return
+            cache.set(self.change_key(version), change,
+                      settings.INDEX_CHANGES_TIMEOUT)
+            if self._version == version - 1:
+                self.apply(change)
+                self._version = version
+
+    def invalidate(self):
+        """Перестроить индекс целиком во всех процессах."""
+        with self._lock:
+            cache.set(self.version_key, time.time_ns(), None)
+            self._version = None
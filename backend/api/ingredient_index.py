@@ -0,0 +1,141 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+from .indexes import VersionedIndex
+
+TRIGRAM_SIZE = 3
+
+
+def trigrams(name):
+    return {
+        name[start:start + TRIGRAM_SIZE]
+        for start in range(len(name) - TRIGRAM_SIZE + 1)
+    }
+
+
+class IngredientIndex(VersionedIndex):
+    """Отсортированный по casefold-имени индекс ингредиентов процесса.
+
+    Поиск по подстроке идёт по триграммам имён: кандидаты — пересечение
+    списков триграмм запроса, поэтому весь индекс не просматривается.
+    """
+
+    version_key = 'ingredient_index_version'
+
+    def __init__(self):
+        super().__init__()
+        self._keys = []
+        self._items = []
+        self._key_by_id = {}
+        self._item_by_id = {}
+        self._trigrams = defaultdict(set)
+
+    @staticmethod
+    def _entry(ingredient_id, name, measurement_unit):
+        return (name.casefold(), ingredient_id), {
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': measurement_unit,
+        }
+
+    def load(self):
+        entries = sorted(
+            (self._entry(*values) for values in
+             Ingredient.objects.values_list('id', 'name', 'measurement_unit')),
+            key=lambda entry: entry[0]
+        )
+        self._keys = [key for key, _ in entries]
+        self._items = [item for _, item in entries]
+        self._key_by_id = {key[1]: key for key in self._keys}
+        self._item_by_id = {item['id']: item for item in self._items}
+        self._trigrams = defaultdict(set)
+        for name, ingredient_id in self._keys:
+            for trigram in trigrams(name):
+                self._trigrams[trigram].add(ingredient_id)
+
+    def apply(self, change):
+        ingredient_id, name, measurement_unit = change
+        self._discard(ingredient_id)
+        if name is None:
+            return
+        key, item = self._entry(ingredient_id, name, measurement_unit)
+        position = bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._items.insert(position, item)
+        self._key_by_id[ingredient_id] = key
+        self._item_by_id[ingredient_id] = item
+        for trigram in trigrams(key[0]):
+            self._trigrams[trigram].add(ingredient_id)
+
+    def add(self, ingredient):
+        self.publish(
+            (ingredient.id, ingredient.name, ingredient.measurement_unit)
+        )
+
+    def remove(self, ingredient_id):
+        self.publish((ingredient_id, None, None))
+
+    def _discard(self, ingredient_id):
+        key = self._key_by_id.pop(ingredient_id, None)
+        if key is None:
+            return
+        del self._item_by_id[ingredient_id]
+        for trigram in trigrams(key[0]):
+            self._trigrams[trigram].discard(ingredient_id)
+            if not self._trigrams[trigram]:
+                del self._trigrams[trigram]
+        position = bisect_left(self._keys, key)
+        del self._keys[position]
+        del self._items[position]
+
+    def _substring(self, query):
+        """Ключи ингредиентов со всеми триграммами query по порядку имён.
+
+        Запросы короче триграммы ищутся только по префиксу.
+        """
+        postings = sorted(
+            (self._trigrams.get(trigram, set())
+             for trigram in trigrams(query)),
+            key=len
+        )
+        if not postings:
+            return []
+        return sorted(
+            (self._key_by_id[ingredient_id]
+             for ingredient_id in postings[0].intersection(*postings[1:])),
+        )
+
+    def search(self, query, limit=None):
+        """Сначала точные совпадения, затем по префиксу, затем по подстроке.
+
+        Точное совпадение — наименьший ключ с этим префиксом, поэтому
+        первые два вида идут подряд от bisect. Возвращает не больше limit
+        ингредиентов (по умолчанию INGREDIENT_SEARCH_LIMIT).
+        """
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        self.ensure_fresh()
+        query = query.casefold()
+        with self._lock:
+            found = []
+            position = bisect_left(self._keys, (query,))
+            for key, item in zip(self._keys[position:position + limit],
+                                 self._items[position:position + limit]):
+                if not key[0].startswith(query):
+                    break
+                found.append(item)
+            if len(found) == limit:
+                return found
+            for name, ingredient_id in self._substring(query):
+                if query in name and not name.startswith(query):
+                    found.append(self._item_by_id[ingredient_id])
+                    if len(found) == limit:
+                        break
+        return found
+
+
+ingredient_index = IngredientIndex()
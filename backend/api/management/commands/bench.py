@@ -0,0 +1,411 @@
+import json
+import logging
+import math
+import random
+import tempfile
+import time
+from functools import partial
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver, reverse
+from rest_framework.authtoken.models import Token
+
+from api import urls
+from api.snapshots import update_snapshots
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            Shopping, SimilarRecipe, Tag)
+from recipes.shopping_cart import rebuild
+from users.models import SubscribeAuthor
+
+User = get_user_model()
+
+PERCENTILES = (50, 95, 99)
+PASSWORD = 'bench-Passw0rd'
+IMAGE = ('data:image/gif;base64,'
+         'R0lGODlhAQABAIAAAAUEBAAAACwAAAAAAQABAAACAkQBADs=')
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench',
+    }
+}
+SKIPPED_METHODS = ('head', 'options', 'trace')
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def routes(patterns):
+    """Именованные маршруты без суффикса формата (.json)."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from routes(pattern.url_patterns)
+        elif pattern.name and (
+            'format' not in pattern.pattern.regex.groupindex
+        ):
+            yield pattern
+
+
+def route_methods(callback):
+    """HTTP-методы маршрута и действия, которые они вызывают."""
+    actions = getattr(callback, 'actions', None) or {
+        method: method for method in callback.cls.http_method_names
+        if hasattr(callback.cls, method)
+    }
+    return {
+        method: action for method, action in actions.items()
+        if method not in SKIPPED_METHODS
+    }
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон эндпоинтов API на синтетических данных '
+            'со сравнением с сохранённым базовым результатом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=50, type=int)
+        parser.add_argument('--recipes', default=500, type=int)
+        parser.add_argument('--ingredients', default=200, type=int)
+        parser.add_argument('--per-recipe', default=8, type=int)
+        parser.add_argument('--requests', default=30, type=int,
+                            help='Запросов на каждый сценарий')
+        parser.add_argument('--seed', default=0, type=int)
+        parser.add_argument('--output', help='Записать результат в JSON')
+        parser.add_argument('--baseline', help='Сравнить с JSON-результатом')
+        parser.add_argument('--tolerance', default=0.2, type=float,
+                            help='Допустимый рост p95 и размера ответа')
+
+    def seed(self, options):
+        rnd = random.Random(options['seed'])
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            User(username=f'bench_{i}', email=f'bench_{i}@example.com',
+                 password=password)
+            for i in range(options['users'])
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'bench_{i}', color=f'#bench{i}'[:7], slug=f'bench_{i}')
+            for i in range(6)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(options['ingredients'])
+        )
+        recipe_tags = [
+            sorted(rnd.sample(tags, 2), key=lambda tag: tag.pk)
+            for _ in range(options['recipes'])
+        ]
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=rnd.choice(users),
+                name=f'Рецепт {i}',
+                text=f'Описание рецепта {i}',
+                cooking_time=rnd.randint(1, 120),
+                image='static/recipe/bench.jpg',
+                tag_ids=[tag.pk for tag in recipe_tags[i]],
+            ) for i in range(options['recipes'])
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe, tags in zip(recipes, recipe_tags) for tag in tags
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=rnd.randint(1, 500))
+            for recipe in recipes
+            for ingredient in rnd.sample(ingredients, options['per_recipe'])
+        )
+        update_snapshots(recipe.pk for recipe in recipes)
+        similar = rnd.sample(recipes[1:], min(10, len(recipes) - 1))
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe=recipes[0], similar=recipe,
+                          score=1 - index / len(similar))
+            for index, recipe in enumerate(similar)
+        )
+        user = users[0]
+        # recipes[0] переключается сценариями и начинает без связей.
+        for model, objects in (
+            (Favorite, recipes[1:]), (Shopping, recipes[1:])
+        ):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for recipe in rnd.sample(objects, min(20, len(objects)))
+            )
+        rebuild([user.pk])
+        SubscribeAuthor.objects.bulk_create(
+            SubscribeAuthor(user=user, author=author)
+            for author in users[1:21]
+        )
+        own_recipe = Recipe.objects.create(
+            author=user, name='Свой рецепт', text='Описание',
+            cooking_time=10, image='static/recipe/bench.jpg'
+        )
+        return {
+            'user': user,
+            'token': Token.objects.create(user=user).key,
+            'recipe': recipes[0],
+            'own_recipe': own_recipe,
+            'author': users[-1],
+            'author_ids': [author.pk for author in users[-10:]],
+            'batch_ids': [recipe.pk for recipe in recipes[-10:]],
+            'tag': tags[0],
+            'ingredient': ingredients[0],
+        }
+
+    def fixtures(self, data):
+        """Тела и свежие объекты для запросов, которым нужны данные.
+
+        Значение — функция номера запроса, возвращающая замену url, data
+        или headers. Удаление получает каждый раз новый объект, поэтому
+        повтор запроса измеряет то же самое, а не 404.
+        """
+        user, recipe = data['user'], data['own_recipe']
+        recipe_body = {
+            'name': 'Рецепт бенчмарка',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'tags': [data['tag'].pk],
+            'ingredients': [
+                {'id': data['ingredient'].pk, 'amount': 10},
+            ],
+        }
+        profile = {
+            'email': user.email, 'username': user.username,
+            'first_name': 'Имя', 'last_name': 'Фамилия',
+        }
+        batch = {'ids': data['batch_ids']}
+
+        def fresh_recipe(number):
+            return {'url': reverse('api:recipes-detail', kwargs={
+                'pk': Recipe.objects.create(
+                    author=user, name=f'bench_delete_{number}', text='-',
+                    cooking_time=1, image='static/recipe/bench.jpg'
+                ).pk
+            })}
+
+        def logout_token(number):
+            token, _ = Token.objects.get_or_create(user=data['author'])
+            return {'headers': {'HTTP_AUTHORIZATION': f'Token {token.key}'}}
+
+        return {
+            ('recipes-list', 'post'): lambda number: {'data': recipe_body},
+            ('recipes-detail', 'put'): lambda number: {
+                'url': reverse('api:recipes-detail', kwargs={'pk': recipe.pk}),
+                'data': recipe_body,
+            },
+            ('recipes-detail', 'patch'): lambda number: {
+                'url': reverse('api:recipes-detail', kwargs={'pk': recipe.pk}),
+                'data': recipe_body,
+            },
+            ('recipes-detail', 'delete'): fresh_recipe,
+            ('recipes-favorite-batch', 'post'): lambda number: {
+                'data': batch
+            },
+            ('recipes-favorite-batch', 'delete'): lambda number: {
+                'data': batch
+            },
+            ('recipes-shopping-cart-batch', 'post'): lambda number: {
+                'data': batch
+            },
+            ('recipes-shopping-cart-batch', 'delete'): lambda number: {
+                'data': batch
+            },
+            ('users-subscribe-batch', 'post'): lambda number: {
+                'data': {'ids': data['author_ids']}
+            },
+            ('users-subscribe-batch', 'delete'): lambda number: {
+                'data': {'ids': data['author_ids']}
+            },
+            ('users-list', 'post'): lambda number: {'data': {
+                'email': f'bench_new_{number}@example.com',
+                'username': f'bench_new_{number}',
+                'first_name': 'Имя', 'last_name': 'Фамилия',
+                'password': PASSWORD,
+            }},
+            ('users-me', 'put'): lambda number: {'data': profile},
+            ('users-me', 'patch'): lambda number: {'data': profile},
+            ('users-set-password', 'post'): lambda number: {'data': {
+                'current_password': PASSWORD, 'new_password': PASSWORD,
+            }},
+            ('login', 'post'): lambda number: {'data': {
+                'email': user.email, 'password': PASSWORD,
+            }},
+            ('logout', 'post'): logout_token,
+        }
+
+    @staticmethod
+    def queries(data):
+        """Варианты строки запроса для маршрутов; '' — без параметров."""
+        return {
+            'users-subscriptions': {'': '?recipes_limit=3'},
+            'ingredients-list': {'': '', '-search': '?name=ингр'},
+            'recipes-list': {
+                '': '',
+                '-tags': f'?tags={data["tag"].slug}',
+                '-favorited': '?is_favorited=1',
+                '-search': '?search=рецепт',
+            },
+            'recipes-pantry': {
+                '': f'?ingredients={data["ingredient"].pk}'
+            },
+        }
+
+    @staticmethod
+    def scenarios(data):
+        """Сценарии по всем именованным маршрутам api.urls.
+
+        Возвращает (имя, методы, url): POST и DELETE одного маршрута
+        (переключатели и пакетные эндпоинты) измеряются парой, чтобы
+        каждый повтор начинался с того же состояния.
+        """
+        objects = {
+            'users': data['author'].pk,
+            'recipes': data['recipe'].pk,
+            'tags': data['tag'].pk,
+            'ingredients': data['ingredient'].pk,
+        }
+        for pattern in routes(urls.urlpatterns):
+            kwargs = {
+                name: objects[pattern.name.split('-')[0]]
+                for name in pattern.pattern.regex.groupindex
+            }
+            url = reverse(f'api:{pattern.name}', kwargs=kwargs)
+            actions = route_methods(pattern.callback)
+            paired = 'post' in actions and 'delete' in actions
+            if paired:
+                yield pattern.name, ('post', 'delete'), url
+            for method in actions:
+                if not (paired and method in ('post', 'delete')):
+                    yield pattern.name, (method,), url
+
+    def call(self, client, method, url, data, headers):
+        if method == 'get':
+            request = partial(client.get, url, **headers)
+        else:
+            request = partial(
+                getattr(client, method), url, json.dumps(data or {}),
+                content_type='application/json', **headers
+            )
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = request()
+            content = (
+                b''.join(response.streaming_content) if response.streaming
+                else response.content
+            )
+            elapsed = (time.perf_counter() - started) * 1000
+        return response.status_code, elapsed, len(queries), len(content)
+
+    def run_scenario(self, client, name, methods, url, headers, options):
+        fixtures = self.fixtures_by_route
+        results = {}
+        for method in methods:
+            results[method] = {'latency': [], 'queries': [],
+                               'bytes': [], 'status': set()}
+        for number in range(options['requests']):
+            for method in methods:
+                fixture = (
+                    fixtures[name, method](next(self.counter))
+                    if (name, method) in fixtures else {}
+                )
+                status, elapsed, queries, size = self.call(
+                    client, method, fixture.get('url', url),
+                    fixture.get('data'),
+                    fixture.get('headers', headers)
+                )
+                result = results[method]
+                result['latency'].append(elapsed)
+                result['queries'].append(queries)
+                result['bytes'].append(size)
+                result['status'].add(status)
+        return {
+            method: dict(
+                {f'p{p}': round(percentile(result['latency'], p), 3)
+                 for p in PERCENTILES},
+                queries=max(result['queries']),
+                bytes=max(result['bytes']),
+                status=sorted(result['status']),
+            ) for method, result in results.items()
+        }
+
+    def run(self, options):
+        data = self.seed(options)
+        self.fixtures_by_route = self.fixtures(data)
+        self.counter = count()
+        client = Client()
+        users = {
+            'anonymous': {},
+            'authenticated': {
+                'HTTP_AUTHORIZATION': f'Token {data["token"]}'
+            },
+        }
+        queries = self.queries(data)
+        report = {}
+        for name, methods, url in self.scenarios(data):
+            variants = queries.get(name) if methods == ('get',) else None
+            for label, query in (variants or {'': ''}).items():
+                for user, headers in users.items():
+                    # Анонимно измеряется только чтение.
+                    if not headers and methods != ('get',):
+                        continue
+                    for method, result in self.run_scenario(
+                        client, name, methods, url + query, headers, options
+                    ).items():
+                        report[
+                            f'{method.upper()} {name}{label} [{user}]'
+                        ] = result
+        return report
+
+    @staticmethod
+    def regressions(report, baseline, tolerance):
+        for key, result in report.items():
+            previous = baseline.get(key)
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                yield (f'{key}: запросов к БД {previous["queries"]} -> '
+                       f'{result["queries"]}')
+            for metric in ('p95', 'bytes'):
+                if result[metric] > previous[metric] * (1 + tolerance):
+                    yield (f'{key}: {metric} {previous[metric]} -> '
+                           f'{result[metric]}')
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        # Данные прогона откатываются, поэтому кэш (ответы, токены, связи)
+        # и загруженные изображения тоже не должны его пережить.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=BENCH_CACHES, MEDIA_ROOT=media_root
+        ), transaction.atomic():
+            report = self.run(options)
+            transaction.set_rollback(True)
+        for key, result in report.items():
+            self.stdout.write(
+                f'{key}: p50 {result["p50"]:.1f} мс, '
+                f'p95 {result["p95"]:.1f} мс, p99 {result["p99"]:.1f} мс, '
+                f'запросов {result["queries"]}, байт {result["bytes"]}, '
+                f'статус {result["status"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = list(self.regressions(
+                report, baseline, options['tolerance']
+            ))
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
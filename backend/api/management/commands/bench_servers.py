@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+from .bench import PERCENTILES, percentile
+
+SERVERS = {
+    'wsgi': ('foodgram.wsgi:application', 'sync'),
+    'asgi': ('foodgram.asgi:application', 'uvicorn.workers.UvicornWorker'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнение пропускной способности gunicorn с WSGI и ASGI '
+            'при одновременных клиентах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=SERVERS,
+                            default=list(SERVERS))
+        parser.add_argument('--concurrency', nargs='+', type=int,
+                            default=[1, 8, 32])
+        parser.add_argument('--duration', default=10.0, type=float,
+                            help='Секунд на каждый уровень нагрузки')
+        parser.add_argument('--workers', default=2, type=int)
+        parser.add_argument('--port', default=8765, type=int)
+        parser.add_argument('--token', help='Токен для авторизованных '
+                                            'запросов')
+        parser.add_argument('--config', default=os.path.join(
+            os.path.dirname(settings.BASE_DIR), 'infra', 'gunicorn.conf.py'
+        ))
+
+    def start(self, server, options):
+        application, worker_class = SERVERS[server]
+        process = subprocess.Popen(
+            (sys.executable, '-m', 'gunicorn', application,
+             '-c', options['config']),
+            cwd=settings.BASE_DIR,
+            env=dict(
+                os.environ,
+                GUNICORN_BIND=f'127.0.0.1:{options["port"]}',
+                GUNICORN_WORKERS=str(options['workers']),
+                GUNICORN_WORKER_CLASS=worker_class,
+            ),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                requests.get(self.base_url + '/api/tags/', timeout=30)
+                return process
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        process.kill()
+        raise CommandError(f'{server}: сервер не запустился')
+
+    def client(self, urls, headers, deadline):
+        latencies, errors = [], 0
+        urls = cycle(urls)
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = session.get(next(urls), headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code != 200
+        return latencies, errors
+
+    def load(self, urls, headers, concurrency, duration):
+        deadline = time.monotonic() + duration
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(
+                lambda _: self.client(urls, headers, deadline),
+                range(concurrency)
+            ))
+        latencies = [value for values, _ in results for value in values]
+        return dict(
+            {f'p{p}': percentile(latencies, p) for p in PERCENTILES},
+            rps=len(latencies) / duration,
+            errors=sum(errors for _, errors in results),
+        )
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ).first()
+        if recipe is None:
+            raise CommandError('Нет рецептов: запустите generate_data')
+        self.base_url = f'http://127.0.0.1:{options["port"]}'
+        urls = [self.base_url + path for path in (
+            '/api/tags/', '/api/ingredients/', '/api/recipes/',
+            f'/api/recipes/{recipe}/',
+        )]
+        headers = (
+            {'Authorization': f'Token {options["token"]}'}
+            if options['token'] else {}
+        )
+        for server in options['servers']:
+            process = self.start(server, options)
+            try:
+                self.load(urls, headers, 1, 1)
+                for concurrency in options['concurrency']:
+                    result = self.load(
+                        urls, headers, concurrency, options['duration']
+                    )
+                    self.stdout.write(
+                        f'{server} x{concurrency}: '
+                        f'{result["rps"]:.0f} запр/с, '
+                        f'p50 {result["p50"]:.1f} мс, '
+                        f'p95 {result["p95"]:.1f} мс, '
+                        f'p99 {result["p99"]:.1f} мс, '
+                        f'ошибок {result["errors"]}'
+                    )
+            finally:
+                process.terminate()
+                process.wait()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.snapshots import update_snapshots
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Сборка готовых представлений рецептов для чтения API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересобрать и актуальные представления')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if not options['force']:
+            recipes = recipes.filter(snapshot__isnull=True)
+        rendered = update_snapshots(
+            recipes.values_list('id', flat=True),
+            expired_only=not options['force']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Собрано представлений: {len(rendered)}'
+        ))
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import read_from
+
+logger = logging.getLogger(__name__)
+
+NUMBERS = re.compile(r"\b\d+\b|'[^']*'")
+PRIMARY_KEY = 'db_primary:{}'
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper, собирающая время каждого SQL-запроса."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+
+class SQLInstrumentationMiddleware:
+    """Количество и время SQL-запросов в заголовке Server-Timing.
+
+    Включается настройкой SQL_INSTRUMENTATION; медленные запросы
+    (дольше SQL_INSTRUMENTATION_SLOW_MS) пишутся в лог вместе с самыми
+    долгими и повторяющимися (N+1) запросами.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            started = time.perf_counter()
+            response = self.get_response(request)
+            total = (time.perf_counter() - started) * 1000
+        sql = sum(duration for _, duration in timer.queries) * 1000
+        duplicates = Counter(
+            NUMBERS.sub('?', query) for query, _ in timer.queries
+        )
+        response['Server-Timing'] = ', '.join((
+            f'sql;dur={sql:.1f};desc="{len(timer.queries)} queries"',
+            f'dup;desc="{sum(duplicates.values()) - len(duplicates)} '
+            f'repeated"',
+            f'app;dur={total - sql:.1f};desc="view and rendering"',
+            f'total;dur={total:.1f}',
+        ))
+        if total >= settings.SQL_INSTRUMENTATION_SLOW_MS:
+            self.log(request, total, sql, timer.queries, duplicates)
+        return response
+
+    @staticmethod
+    def log(request, total, sql, queries, duplicates):
+        worst = sorted(queries, key=lambda query: query[1], reverse=True)[:3]
+        logger.warning(
+            'Медленный запрос %s %s: %.1f мс, SQL %.1f мс, запросов %d\n'
+            'Самые долгие:\n%s\nПовторяющиеся:\n%s',
+            request.method, request.get_full_path(), total, sql, len(queries),
+            '\n'.join(f'{duration * 1000:.1f} мс: {query}'
+                      for query, duration in worst),
+            '\n'.join(f'{count}x: {query}'
+                      for query, count in duplicates.most_common(3)
+                      if count > 1),
+        )
+
+
+class ReadReplicaMiddleware:
+    """Направляет чтение безопасных запросов на реплику.
+
+    После успешного небезопасного запроса клиент с тем же заголовком
+    Authorization читает из основной БД ещё READ_YOUR_WRITES_WINDOW секунд,
+    чтобы видеть собственные изменения. Отметка хранится в общем кэше:
+    следующий запрос может обслужить другой воркер.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    @staticmethod
+    def primary_key(request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if authorization:
+            return PRIMARY_KEY.format(
+                hashlib.sha256(authorization.encode()).hexdigest()
+            )
+        return None
+
+    def __call__(self, request):
+        key = self.primary_key(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if key and response.status_code < 400:
+                cache.set(key, True, settings.READ_YOUR_WRITES_WINDOW)
+            return response
+        alias = None
+        if not (key and cache.get(key)):
+            alias = random.choice(settings.DATABASE_REPLICAS)
+        with read_from(alias):
+            return self.get_response(request)
@@ -0,0 +1,121 @@
+from collections import defaultdict
+
+import numpy as np
+
+from recipes.models import RecipeIngredient
+
+from .db_routers import use_primary
+from .indexes import VersionedIndex
+
+
+class PantryIndex(VersionedIndex):
+    """Обратный индекс «ингредиент -> отсортированные id рецептов»."""
+
+    version_key = 'pantry_index_version'
+
+    def __init__(self):
+        super().__init__()
+        self._postings = {}
+        self._ingredients = {}
+        self._recipe_ids = np.empty(0, dtype=np.int32)
+        self._sizes = np.empty(0, dtype=np.int32)
+
+    def load(self):
+        postings = defaultdict(list)
+        ingredients = defaultdict(set)
+        for ingredient_id, recipe_id in RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator():
+            postings[ingredient_id].append(recipe_id)
+            ingredients[recipe_id].add(ingredient_id)
+        self._postings = {
+            ingredient_id: np.array(recipe_ids, dtype=np.int32)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self._ingredients = dict(ingredients)
+        self._recipe_ids = np.array(sorted(ingredients), dtype=np.int32)
+        self._sizes = np.array(
+            [len(ingredients[recipe_id]) for recipe_id in self._recipe_ids],
+            dtype=np.int32
+        )
+
+    def _discard(self, recipe_id):
+        for ingredient_id in self._ingredients.pop(recipe_id, ()):
+            posting = self._postings[ingredient_id]
+            posting = np.delete(
+                posting, np.searchsorted(posting, recipe_id)
+            )
+            if posting.size:
+                self._postings[ingredient_id] = posting
+            else:
+                del self._postings[ingredient_id]
+        position = np.searchsorted(self._recipe_ids, recipe_id)
+        if position < self._recipe_ids.size and (
+            self._recipe_ids[position] == recipe_id
+        ):
+            self._recipe_ids = np.delete(self._recipe_ids, position)
+            self._sizes = np.delete(self._sizes, position)
+
+    def apply(self, change):
+        recipe_id, ingredient_ids = change
+        self._discard(recipe_id)
+        if ingredient_ids:
+            self._add(recipe_id, set(ingredient_ids))
+
+    def update(self, recipe_id):
+        """Перечитать ингредиенты рецепта после его изменения."""
+        with use_primary():
+            ingredient_ids = sorted(RecipeIngredient.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('ingredient_id', flat=True))
+        self.publish((recipe_id, ingredient_ids))
+
+    def _add(self, recipe_id, ingredient_ids):
+        self._ingredients[recipe_id] = ingredient_ids
+        for ingredient_id in ingredient_ids:
+            posting = self._postings.get(
+                ingredient_id, np.empty(0, dtype=np.int32)
+            )
+            self._postings[ingredient_id] = np.insert(
+                posting, np.searchsorted(posting, recipe_id), recipe_id
+            )
+        position = np.searchsorted(self._recipe_ids, recipe_id)
+        self._recipe_ids = np.insert(self._recipe_ids, position, recipe_id)
+        self._sizes = np.insert(self._sizes, position, len(ingredient_ids))
+
+    def remove(self, recipe_id):
+        self.publish((recipe_id, ()))
+
+    def search(self, ingredient_ids, limit):
+        """Рецепты по убыванию доли имеющихся ингредиентов.
+
+        Возвращает список (id рецепта, доля, id недостающих ингредиентов).
+        """
+        self.ensure_fresh()
+        with self._lock:
+            postings = [
+                self._postings[ingredient_id]
+                for ingredient_id in set(ingredient_ids)
+                if ingredient_id in self._postings
+            ]
+            if not postings:
+                return []
+            recipe_ids, matched = np.unique(
+                np.concatenate(postings), return_counts=True
+            )
+            sizes = self._sizes[np.searchsorted(self._recipe_ids, recipe_ids)]
+            coverage = matched / sizes
+            order = np.lexsort((-recipe_ids, -matched, -coverage))[:limit]
+            return [
+                (
+                    int(recipe_ids[position]),
+                    float(coverage[position]),
+                    sorted(
+                        self._ingredients[int(recipe_ids[position])]
+                        - set(ingredient_ids)
+                    ),
+                ) for position in order
+            ]
+
+
+pantry_index = PantryIndex()
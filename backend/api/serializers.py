@@ -1,13 +1,24 @@
 from django.conf import settings
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            Shopping, Tag)
-from users.models import SubscribeAuthor, User
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+from .user_relations import get_request_relations
+from .utils import get_recipes_limit
+
+IMAGE_FORMATS = ('webp', 'jpeg')
+USER_FLAGS = ('is_subscribed', 'is_favorited', 'is_in_shopping_cart')
+
+
+def build_absolute_url(request, url):
+    if url and request:
+        return request.build_absolute_uri(url)
+    return url
 
 
 class UserRegistrationSerializer(UserCreateSerializer):
@@ -30,15 +41,15 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return SubscribeAuthor.objects.filter(user=user, author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_request_relations(
+            self.context.get('request')
+        ).following
 
 
 class SubscriptionListSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -49,142 +60,104 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, author):
-        return SubscribeAuthor.objects.filter(
-            user=self.context.get('request').user,
-            author=author
-        ).exists()
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return author.id in get_request_relations(
+            self.context.get('request')
+        ).following
 
     def get_recipes(self, author):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=author)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(author, 'limited_recipes'):
+            queryset = author.limited_recipes
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            queryset = Recipe.objects.filter(author=author)[:limit]
         return FavoriteRecipeSerializer(queryset, many=True).data
 
-    def get_recipes_count(self, author):
-        return Recipe.objects.filter(author=author).count()
 
+class RecipeImageField(serializers.ReadOnlyField):
+    """Ссылка на подходящую версию изображения рецепта."""
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = SubscribeAuthor
-        fields = ('user', 'author')
+    def __init__(self, rendition=None, **kwargs):
+        kwargs['source'] = '*'
+        self.rendition = rendition
+        super().__init__(**kwargs)
 
-    def validate(self, data):
-        if self.context.get('request').method == 'POST':
-            get_object_or_404(User, username=data['author'])
-            if self.context['request'].user == data['author']:
-                raise serializers.ValidationError({
-                    'errors': 'На себя подписываться нельзя.'
-                })
-            if SubscribeAuthor.objects.filter(
-                user=self.context['request'].user,
-                author=data['author']
-            ):
-                raise serializers.ValidationError({
-                    'errors': 'Вы уже подписаны.'
-                })
-            return data
-
-        if self.context['request'].user == data['author']:
-            raise serializers.ValidationError({
-                'errors': 'Нельзя отписаться от самого себя.'
-            })
-        if SubscribeAuthor.objects.filter(
-            user=self.context['request'].user,
-            author=data['author']
-        ).exists() is False:
-            raise serializers.ValidationError({
-                'errors': 'Вы не подписаны.'
-            })
-        return data
+    def get_rendition(self):
+        if self.rendition:
+            return self.rendition
+        if isinstance(self.parent.parent, serializers.ListSerializer):
+            return 'card'
+        return 'detail'
 
-    def to_representation(self, instance):
-        return SubscriptionListSerializer(
-            instance.author,
-            context={'request': self.context.get('request')}
-        ).data
+    def build_url(self, url):
+        return build_absolute_url(self.context.get('request'), url)
+
+    def to_representation(self, recipe):
+        return self.build_url(recipe.get_image_url(self.get_rendition()))
+
+
+class RecipeImageRenditionsField(RecipeImageField):
+
+    def to_representation(self, recipe):
+        return {
+            rendition: {
+                image_format: self.build_url(
+                    recipe.get_image_url(rendition, image_format)
+                ) for image_format in IMAGE_FORMATS
+            } for rendition in settings.RECIPE_IMAGE_RENDITIONS
+        }
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = RecipeImageField(rendition='card')
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        request = self.context.get('request')
-        recipe = data['recipe']
-        if self.context.get('request').method == 'POST':
-            if not request or request.user.is_anonymous:
-                return False
-            if Favorite.objects.filter(
-                user=request.user,
-                recipe=recipe
-            ).exists():
-                raise serializers.ValidationError({
-                    'errors': 'Уже есть в избранном.'
-                })
-            return data
-        if Favorite.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).exists() is False:
-            raise serializers.ValidationError({
-                'errors': 'Избранное не существует.'
-            })
-        return data
+class SimilarRecipeSerializer(FavoriteRecipeSerializer):
+    score = serializers.FloatField(read_only=True)
 
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-        return FavoriteRecipeSerializer(
-            instance.recipe, context=context
-        ).data
+    class Meta(FavoriteRecipeSerializer.Meta):
+        fields = FavoriteRecipeSerializer.Meta.fields + ('score',)
 
 
-class CartSerializer(serializers.ModelSerializer):
+class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
-        fields = ['recipe', 'user']
-        model = Shopping
+        model = Ingredient
+        fields = ('id', 'name', 'measurement_unit')
 
-    def validate(self, data):
-        request = self.context.get('request')
-        recipe = data['recipe']
-        if self.context.get('request').method == 'POST':
-            if Shopping.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
-                raise serializers.ValidationError({
-                    'errors': 'Рецепт уже в списке покупок'
-                })
-            return data
-        if Shopping.objects.filter(
-                user=request.user, recipe=recipe
-        ).exists() is False:
-            raise serializers.ValidationError({
-                'errors': 'Рецепта нет в списке покупок'
-            })
-        return data
 
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-        return FavoriteRecipeSerializer(instance.recipe, context=context).data
+class BatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_SIZE
+    )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Ingredient
-        fields = ('id', 'name', 'measurement_unit')
+class PantryQuerySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=100,
+        default=settings.REST_FRAMEWORK['PAGE_SIZE']
+    )
+
+
+class PantryRecipeSerializer(FavoriteRecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = IngredientSerializer(many=True, read_only=True)
+
+    class Meta(FavoriteRecipeSerializer.Meta):
+        fields = FavoriteRecipeSerializer.Meta.fields + (
+            'coverage', 'missing_ingredients'
+        )
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -254,21 +227,28 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ('author',)
 
     def validate(self, data):
-        ingredients_list = []
         if not data['ingredients']:
             raise serializers.ValidationError(
                 'Добавьте ингридиенты')
+        names = dict(Ingredient.objects.filter(
+            id__in={ingredient['id'] for ingredient in data['ingredients']}
+        ).values_list('id', 'name'))
+        added = set()
+        errors = []
         for ingredient in data['ingredients']:
-            ingredient_db = get_object_or_404(Ingredient, id=ingredient['id'])
-            if ingredient_db in ingredients_list:
-                raise serializers.ValidationError(
-                    f'{ingredient_db} - уже добавлен в рецепт'
+            error = {}
+            if ingredient['id'] not in names:
+                error['id'] = f'Ингредиент {ingredient["id"]} не найден'
+            elif ingredient['id'] in added:
+                error['id'] = (
+                    f'{names[ingredient["id"]]} - уже добавлен в рецепт'
                 )
             if float(ingredient['amount']) < settings.INGREDIENT_AMOUNT_MIN:
-                raise serializers.ValidationError(
-                    settings.INGREDIENT_AMOUNT_ERROR
-                )
-            ingredients_list.append(ingredient_db)
+                error['amount'] = settings.INGREDIENT_AMOUNT_ERROR
+            added.add(ingredient['id'])
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError({'ingredients': errors})
 
         if not data['tags']:
             raise serializers.ValidationError(
@@ -290,6 +270,7 @@ class RecipeSerializer(serializers.ModelSerializer):
                 amount=ingredient.get('amount')
             ) for ingredient in ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -298,16 +279,23 @@ class RecipeSerializer(serializers.ModelSerializer):
         self.__create_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
+        # Записываются только присланные поля: tag_ids, счётчики и
+        # similar_stale меняют запросы в обработчиках сигналов, и полное
+        # save() вернуло бы их значения, прочитанные до этих запросов.
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.snapshot = None
+        instance.save(update_fields=(*validated_data, 'snapshot'))
+        if ingredients is not None:
             instance.ingredients.clear()
             self.__create_ingredients(ingredients, instance)
-        if 'tags' in validated_data:
-            instance.tags.set(
-                validated_data.pop('tags'))
-        return super().update(
-            instance, validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        return instance
 
     def to_representation(self, instance):
         self.fields.pop('ingredients')
@@ -323,7 +311,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 
 class RecipeGetSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = RecipeImageField()
+    image_renditions = RecipeImageRenditionsField()
     ingredients = serializers.SerializerMethodField()
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
@@ -334,26 +323,103 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'author', 'name', 'text', 'ingredients', 'tags',
-            'cooking_time', 'is_favorited', 'image',
+            'cooking_time', 'is_favorited', 'image', 'image_renditions',
             'is_in_shopping_cart'
         )
         read_only_fields = ('id', 'author',)
 
-    def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.favorites.filter(user=user).exists()
-
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.shopping_cart.filter(user=user).exists()
-
     def get_ingredients(self, obj):
-        recipe_ingredients = RecipeIngredient.objects.filter(recipe=obj)
         return IngredientRecipeAmountSerializer(
-            recipe_ingredients,
+            obj.recipe.all(),
             many=True
         ).data
+
+    def get_is_favorited(self, obj):
+        return obj.id in get_request_relations(
+            self.context.get('request')
+        ).favorites
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in get_request_relations(
+            self.context.get('request')
+        ).shopping_cart
+
+
+class AuthorSnapshotSerializer(UserSerializer):
+    class Meta(UserSerializer.Meta):
+        fields = tuple(
+            field for field in UserSerializer.Meta.fields
+            if field not in USER_FLAGS
+        )
+
+
+class RecipeSnapshotSerializer(RecipeGetSerializer):
+    """Общая для всех пользователей часть RecipeGetSerializer.
+
+    Ссылки на изображения остаются относительными, а image выбирается
+    из image_renditions при чтении.
+    """
+
+    author = AuthorSnapshotSerializer(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = tuple(
+            field for field in RecipeGetSerializer.Meta.fields
+            if field not in USER_FLAGS + ('image',)
+        )
+
+
+def ordered(data, fields):
+    return {field: data[field] for field in fields}
+
+
+class RecipeOverlaySerializer(serializers.BaseSerializer):
+    """RecipeGetSerializer поверх готового представления рецепта.
+
+    Отметки пользователя берутся из его наборов связей.
+    Порядок ключей восстанавливается: jsonb его не хранит.
+    """
+
+    def get_rendition(self):
+        if isinstance(self.parent, serializers.ListSerializer):
+            return 'card'
+        return 'detail'
+
+    def to_representation(self, recipe):
+        snapshot = recipe.snapshot
+        request = self.context.get('request')
+        relations = get_request_relations(request)
+        image_renditions = {
+            rendition: {
+                image_format: build_absolute_url(
+                    request, snapshot['image_renditions'][rendition][
+                        image_format
+                    ]
+                ) for image_format in IMAGE_FORMATS
+            } for rendition in settings.RECIPE_IMAGE_RENDITIONS
+        }
+        values = {
+            'author': dict(
+                ordered(
+                    snapshot['author'], AuthorSnapshotSerializer.Meta.fields
+                ),
+                is_subscribed=snapshot['author']['id'] in relations.following
+            ),
+            'ingredients': [
+                ordered(
+                    ingredient, IngredientRecipeAmountSerializer.Meta.fields
+                ) for ingredient in snapshot['ingredients']
+            ],
+            'tags': [
+                ordered(tag, TagSerializer.Meta.fields)
+                for tag in snapshot['tags']
+            ],
+            'is_favorited': recipe.id in relations.favorites,
+            'is_in_shopping_cart': recipe.id in relations.shopping_cart,
+            'image': image_renditions[self.get_rendition()]['jpeg'],
+            'image_renditions': image_renditions,
+        }
+        return {
+            field: values[field] if field in values else snapshot[field]
+            for field in RecipeGetSerializer.Meta.fields
+        }
@@ -0,0 +1,182 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.management.loaders import bulk_loaded
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            Shopping, Tag)
+from recipes.relations import relations_added, relations_removed
+from recipes.transactions import on_commit_once
+from users.models import SubscribeAuthor
+
+from .authentication import forget_token, forget_user_token
+from .cache import invalidate
+from .ingredient_index import ingredient_index
+from .pantry_index import pantry_index
+from .serializers import AuthorSnapshotSerializer
+from .snapshots import refresh_snapshots, render_expired, rerender_snapshots
+from .user_relations import forget_user_relations
+
+User = get_user_model()
+
+CACHE_NAMESPACES = {
+    Tag: ('tags', 'recipes'),
+    Ingredient: ('ingredients', 'recipes'),
+    Recipe: ('recipes',),
+    RecipeIngredient: ('recipes',),
+    Recipe.tags.through: ('recipes',),
+    Recipe.ingredients.through: ('recipes',),
+}
+SNAPSHOT_RELATIONS = {
+    Recipe.tags.through: 'tags',
+    Recipe.ingredients.through: 'ingredients',
+}
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: ingredient_index.add(instance))
+
+
+@receiver(post_delete, sender=Ingredient)
+def remove_from_ingredient_index(sender, instance, **kwargs):
+    ingredient_id = instance.id
+    transaction.on_commit(lambda: ingredient_index.remove(ingredient_id))
+
+
+@receiver(bulk_loaded, sender=Ingredient)
+def rebuild_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+def invalidate_cache(sender, **kwargs):
+    namespaces = CACHE_NAMESPACES[sender]
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+for model in (Tag, Ingredient, Recipe, RecipeIngredient):
+    post_save.connect(invalidate_cache, sender=model)
+    post_delete.connect(invalidate_cache, sender=model)
+for model in (Tag, Ingredient):
+    bulk_loaded.connect(invalidate_cache, sender=model)
+for through in (Recipe.tags.through, Recipe.ingredients.through):
+    m2m_changed.connect(invalidate_cache, sender=through)
+
+
+@receiver(post_save, sender=Recipe)
+def update_pantry_index(sender, instance, **kwargs):
+    on_commit_once(pantry_index.update, instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_pantry_index(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: pantry_index.remove(recipe_id))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def update_pantry_index_ingredients(sender, instance, **kwargs):
+    on_commit_once(pantry_index.update, instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_pantry_index_m2m(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if not reverse:
+        on_commit_once(pantry_index.update, instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        for recipe_id in pk_set:
+            on_commit_once(pantry_index.update, recipe_id)
+    elif action == 'post_clear':
+        transaction.on_commit(pantry_index.invalidate)
+
+
+@receiver(pre_save, sender=Recipe)
+def clear_recipe_snapshot(sender, instance, update_fields, **kwargs):
+    # Полное сохранение сбрасывает представление тем же UPDATE.
+    if update_fields is None:
+        instance.snapshot = None
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_snapshot(sender, instance, update_fields, **kwargs):
+    # Сохранение, записавшее snapshot, уже сбросило представление.
+    if update_fields is None or 'snapshot' in update_fields:
+        on_commit_once(render_expired, instance.pk)
+    else:
+        refresh_snapshots([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_recipe_snapshot_ingredients(sender, instance, **kwargs):
+    refresh_snapshots([instance.recipe_id])
+
+
+def refresh_recipe_snapshot_m2m(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_snapshots([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        rerender_snapshots(Recipe.objects.filter(id__in=pk_set))
+    elif action == 'pre_clear':
+        rerender_snapshots(Recipe.objects.filter(
+            **{SNAPSHOT_RELATIONS[sender]: instance}
+        ))
+
+
+for through in SNAPSHOT_RELATIONS:
+    m2m_changed.connect(refresh_recipe_snapshot_m2m, sender=through)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def expire_tag_snapshots(sender, instance, **kwargs):
+    if not kwargs.get('created'):
+        rerender_snapshots(
+            Recipe.objects.filter(tag_ids__contains=[instance.pk])
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def expire_ingredient_snapshots(sender, instance, created, **kwargs):
+    if not created:
+        rerender_snapshots(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=User)
+def expire_author_snapshots(sender, instance, created, update_fields,
+                            **kwargs):
+    if created or update_fields is not None and not set(update_fields) & set(
+        AuthorSnapshotSerializer.Meta.fields
+    ):
+        return
+    rerender_snapshots(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: forget_token(key))
+
+
+@receiver(post_save, sender=User)
+def forget_changed_user_token(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_user_token(user_id))
+
+
+def forget_changed_relations(sender, instance=None, user_id=None, **kwargs):
+    if instance is not None:
+        user_id = instance.user_id
+    transaction.on_commit(lambda: forget_user_relations(user_id))
+
+
+for model in (Favorite, Shopping, SubscribeAuthor):
+    for signal in (post_save, post_delete, relations_added, relations_removed):
+        signal.connect(forget_changed_relations, sender=model)
@@ -0,0 +1,107 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+
+from recipes.models import Recipe
+from recipes.transactions import on_commit_once
+
+from .db_routers import use_primary
+from .serializers import RecipeSnapshotSerializer
+
+BLOCK_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=1)
+
+
+def update_snapshots(recipe_ids, expired_only=False):
+    """Пересобирает готовые представления рецептов.
+
+    Строки рецептов блокируются до чтения данных: устаревание (snapshot =
+    NULL) ставится UPDATE той же строки в транзакции изменения, поэтому
+    представление, собранное по старым данным, не перезапишет отметку.
+    С expired_only уже пересобранные после отметки рецепты пропускаются.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    snapshots = {}
+    for start in range(0, len(recipe_ids), BLOCK_SIZE):
+        with use_primary(), transaction.atomic():
+            recipes = Recipe.objects.select_for_update(of=('self',)).filter(
+                id__in=recipe_ids[start:start + BLOCK_SIZE]
+            )
+            if expired_only:
+                recipes = recipes.filter(snapshot__isnull=True)
+            recipes = list(recipes.order_by('id').with_related())
+            for recipe, snapshot in zip(recipes, RecipeSnapshotSerializer(
+                recipes, many=True
+            ).data):
+                recipe.snapshot = snapshot
+            Recipe.objects.bulk_update(recipes, ('snapshot',))
+        snapshots.update((recipe.id, recipe.snapshot) for recipe in recipes)
+    return snapshots
+
+
+def render_expired(recipe_id):
+    update_snapshots([recipe_id], expired_only=True)
+
+
+def fill_snapshots(recipes):
+    """Подставляет устаревшим рецептам представления, собранные в памяти.
+
+    Чтение ничего не пишет и не блокирует: сохранённые представления
+    пересобирает обработчик после коммита изменения или команда
+    render_recipe_snapshots.
+    """
+    missing = {
+        recipe.id: recipe for recipe in recipes if recipe.snapshot is None
+    }
+    if not missing:
+        return
+    fresh = list(Recipe.objects.filter(id__in=missing).with_related())
+    for recipe, snapshot in zip(fresh, RecipeSnapshotSerializer(
+        fresh, many=True
+    ).data):
+        missing[recipe.id].snapshot = snapshot
+
+
+def expire_snapshots(queryset):
+    """Помечает представления устаревшими в текущей транзакции."""
+    return queryset.filter(snapshot__isnull=False).update(snapshot=None)
+
+
+def refresh_snapshots(recipe_ids):
+    """Помечает представления устаревшими и пересобирает их после коммита."""
+    recipe_ids = list(recipe_ids)
+    expire_snapshots(Recipe.objects.filter(id__in=recipe_ids))
+    for recipe_id in recipe_ids:
+        on_commit_once(render_expired, recipe_id)
+
+
+def _render_expired_task(recipe_ids):
+    try:
+        update_snapshots(recipe_ids, expired_only=True)
+    except Exception:
+        logger.exception('Не удалось пересобрать представления %d рецептов',
+                         len(recipe_ids))
+    finally:
+        connection.close()
+
+
+def rerender_snapshots(queryset):
+    """Помечает представления устаревшими и пересобирает их в фоне.
+
+    Для массовых изменений (переименование тега, ингредиента, автора):
+    после коммита затронутые рецепты пересобираются пачками по
+    BLOCK_SIZE в отдельном потоке, не задерживая ответ.
+    """
+    recipe_ids = list(queryset.filter(
+        snapshot__isnull=False
+    ).values_list('id', flat=True))
+    if not recipe_ids:
+        return
+    expire_snapshots(Recipe.objects.filter(id__in=recipe_ids))
+    transaction.on_commit(
+        lambda: executor.submit(_render_expired_task, recipe_ids)
+    )
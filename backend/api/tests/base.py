@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+
+class ApiTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user', 'user@example.com', 'password'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                f'author_{i}', f'author_{i}@example.com', 'password'
+            ) for i in range(4)
+        ]
+        cls.tags = [
+            Tag.objects.create(name=f'тег {i}', color=f'#00000{i}',
+                               slug=f'tag_{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def make_recipe(self, number=0, ingredients=3, tags=1, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.authors[number % len(self.authors)],
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=5,
+                image='static/recipe/test.gif',
+                **fields
+            )
+            recipe.tags.set(self.tags[:tags])
+            for ingredient in self.ingredients[:ingredients]:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=2
+                )
+        return recipe
+
+    def make_recipes(self, count, **kwargs):
+        return [self.make_recipe(number, **kwargs) for number in range(count)]
+
+    def get_counted(self, url, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, **kwargs)
+        return response, len(context.captured_queries)
@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from api.checks import check_shared_cache
+
+from .base import ApiTestCase
+
+
+class CachedTokenTest(ApiTestCase):
+    url = reverse('api:users-me')
+
+    def setUp(self):
+        super().setUp()
+        response = self.client.post(reverse('api:login'), {
+            'email': 'user@example.com', 'password': 'password'
+        })
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+
+    def test_cached_user(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response, queries = self.get_counted(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, 0)
+
+    def test_forgotten_after_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_logout(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api:logout'))
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def test_process_local_cache_is_rejected(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ['api.E001']
+        )
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': 'memcached:11211',
+        }}):
+            self.assertEqual(check_shared_cache(None), [])
@@ -0,0 +1,89 @@
+from django.urls import reverse
+
+from recipes.models import Favorite, Recipe, Shopping
+from recipes.relations import add_relations
+from users.models import User
+
+from .base import ApiTestCase
+
+MISSING = 2 ** 31 - 1
+
+
+class BatchRelationsTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.make_recipes(3)
+        self.ids = [recipe.pk for recipe in self.recipes]
+        self.client.force_authenticate(self.user)
+
+    def counters(self, field):
+        return list(Recipe.objects.filter(id__in=self.ids).order_by(
+            'id'
+        ).values_list(field, flat=True))
+
+    def test_shopping_cart(self):
+        url = reverse('api:recipes-shopping-cart-batch')
+        Shopping.objects.create(user=self.user, recipe=self.recipes[0])
+        response = self.client.post(
+            url, {'ids': self.ids + [MISSING, self.ids[1]]}, format='json'
+        )
+        self.assertEqual(response.data['results'], {
+            self.ids[0]: 'exists',
+            self.ids[1]: 'added',
+            self.ids[2]: 'added',
+            MISSING: 'not_found',
+        })
+        self.assertEqual(self.counters('carts_count'), [1, 1, 1])
+        shopping_list = self.client.get(reverse('api:recipes-shopping-list'))
+        self.assertEqual(shopping_list.data[0]['amount'], 6)
+        response = self.client.delete(
+            url, {'ids': self.ids[:2] + [MISSING]}, format='json'
+        )
+        self.assertEqual(response.data['results'], {
+            self.ids[0]: 'removed',
+            self.ids[1]: 'removed',
+            MISSING: 'not_found',
+        })
+        self.assertEqual(self.counters('carts_count'), [0, 0, 1])
+        shopping_list = self.client.get(reverse('api:recipes-shopping-list'))
+        self.assertEqual(shopping_list.data[0]['amount'], 2)
+
+    def test_favorites(self):
+        url = reverse('api:recipes-favorite-batch')
+        self.client.post(url, {'ids': self.ids}, format='json')
+        self.client.post(url, {'ids': self.ids}, format='json')
+        self.assertEqual(self.counters('favorites_count'), [1, 1, 1])
+        response = self.client.delete(url, {'ids': self.ids}, format='json')
+        self.assertEqual(set(response.data['results'].values()), {'removed'})
+        self.assertEqual(self.counters('favorites_count'), [0, 0, 0])
+
+    def test_subscriptions(self):
+        url = reverse('api:users-subscribe-batch')
+        ids = [author.pk for author in self.authors]
+        response = self.client.post(
+            url, {'ids': ids + [self.user.pk]}, format='json'
+        )
+        self.assertEqual(response.data['results'][self.user.pk], 'self')
+        self.assertEqual(User.objects.get(pk=ids[0]).followers_count, 1)
+        self.client.delete(url, {'ids': ids[:1]}, format='json')
+        self.assertEqual(User.objects.get(pk=ids[0]).followers_count, 0)
+
+    def test_validation(self):
+        url = reverse('api:users-subscribe-batch')
+        self.assertEqual(
+            self.client.post(url, {'ids': []}, format='json').status_code, 400
+        )
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            reverse('api:recipes-favorite-batch'), {'ids': self.ids},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_only_inserted_rows_are_counted(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipes[1])
+        added = add_relations(
+            Favorite, self.user.pk, 'recipe', self.ids + self.ids
+        )
+        self.assertEqual(sorted(added), [self.ids[0], self.ids[2]])
+        self.assertEqual(self.counters('favorites_count'), [1, 1, 1])
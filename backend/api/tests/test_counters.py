@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+from .base import ApiTestCase
+
+
+class RecountCountersTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.make_recipe()
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=5, carts_count=2
+        )
+        User.objects.filter(pk=self.recipe.author_id).update(
+            recipes_count=0
+        )
+
+    def recount(self, *args):
+        output = StringIO()
+        call_command('recount_counters', *args, stdout=output)
+        return output.getvalue()
+
+    def counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = User.objects.get(pk=self.recipe.author_id)
+        return recipe.favorites_count, recipe.carts_count, author.recipes_count
+
+    def test_dry_run(self):
+        self.assertIn(
+            'carts_count: расхождений 1', self.recount('--dry-run')
+        )
+        self.assertEqual(self.counters(), (5, 2, 0))
+
+    def test_fixed_in_sql(self):
+        with CaptureQueriesContext(connection) as context:
+            output = self.recount()
+        self.assertIn('favorites_count: расхождений 1', output)
+        self.assertEqual(self.counters(), (1, 0, 1))
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 4)
+        for sql in updates:
+            self.assertIn('SELECT COUNT', sql)
+        self.assertNotIn('расхождений 1', self.recount())
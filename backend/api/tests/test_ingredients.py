@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from api.ingredient_index import IngredientIndex, ingredient_index
+from recipes.models import Ingredient
+
+from .base import ApiTestCase
+
+
+class IngredientSearchTest(ApiTestCase):
+    url = reverse('api:ingredients-list')
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.invalidate()
+        for name in ('Морская соль', 'Соль морская', 'Соль', 'Фасоль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def search(self, name):
+        response = self.client.get(self.url, {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_exact_then_prefix_then_substring(self):
+        self.assertEqual(
+            self.search('СОЛЬ'),
+            ['Соль', 'Соль морская', 'Морская соль', 'Фасоль']
+        )
+
+    def test_short_query_matches_prefix_only(self):
+        self.assertEqual(self.search('со'), ['Соль', 'Соль морская'])
+
+    def test_index_follows_changes(self):
+        self.search('сол')
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient = Ingredient.objects.create(
+                name='Солод', measurement_unit='г'
+            )
+        self.assertIn('Солод', self.search('сол'))
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.name = 'Ячмень'
+            ingredient.save()
+        self.assertNotIn('Солод', self.search('сол'))
+        self.assertEqual(self.search('мень'), ['Ячмень'])
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.delete()
+        self.assertEqual(self.search('ячм'), [])
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=3)
+    def test_result_is_capped(self):
+        self.assertEqual(
+            self.search('соль'), ['Соль', 'Соль морская', 'Морская соль']
+        )
+        self.assertEqual(len(self.search('ингредиент')), 3)
+
+
+class IngredientIndexSyncTest(ApiTestCase):
+    """Индекс другого воркера видит изменения через общий кэш."""
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.invalidate()
+        self.worker = IngredientIndex()
+        self.worker.ensure_fresh()
+
+    def names(self, query):
+        return [item['name'] for item in self.worker.search(query)]
+
+    def test_applies_changes_without_reload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient = Ingredient.objects.create(
+                name='Солод', measurement_unit='г'
+            )
+        with mock.patch.object(self.worker, 'load') as load:
+            self.assertEqual(self.names('солод'), ['Солод'])
+            with self.captureOnCommitCallbacks(execute=True):
+                ingredient.name = 'Ячмень'
+                ingredient.save()
+            self.assertEqual(self.names('солод'), [])
+            self.assertEqual(self.names('ячмень'), ['Ячмень'])
+        load.assert_not_called()
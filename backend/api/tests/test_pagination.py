@@ -0,0 +1,53 @@
+from django.urls import reverse
+
+from users.models import SubscribeAuthor
+
+from .base import ApiTestCase
+
+
+class KeysetPaginationTest(ApiTestCase):
+    url = reverse('api:recipes-list')
+
+    def test_pages_are_stable_under_inserts(self):
+        recipes = self.make_recipes(7)
+        response = self.client.get(self.url, {'cursor': '', 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        first = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(first, [recipe.pk for recipe in recipes[:-4:-1]])
+        self.make_recipes(2)
+        response = self.client.get(response.data['next'])
+        second = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(second, [recipe.pk for recipe in recipes[-4:-7:-1]])
+
+    def test_estimated_count(self):
+        self.make_recipes(3)
+        response = self.client.get(
+            self.url, {'cursor': '', 'limit': 2, 'count': 'estimate'}
+        )
+        self.assertIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_cursor_rejected_with_search(self):
+        self.make_recipes(3)
+        response = self.client.get(
+            self.url, {'cursor': '', 'search': 'рецепт'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+        response = self.client.get(self.url, {'search': 'рецепт'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_subscriptions(self):
+        self.make_recipes(4)
+        for author in self.authors:
+            SubscribeAuthor.objects.create(user=self.user, author=author)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            reverse('api:users-subscriptions'),
+            {'cursor': '', 'limit': 3, 'recipes_limit': 1}
+        )
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
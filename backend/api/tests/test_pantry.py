@@ -0,0 +1,125 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.pantry_index import PantryIndex, pantry_index
+from recipes.models import RecipeIngredient
+
+from .base import ApiTestCase
+
+
+class PantrySearchTest(ApiTestCase):
+    url = reverse('api:recipes-pantry')
+
+    def setUp(self):
+        super().setUp()
+        pantry_index.invalidate()
+        self.recipes = self.make_recipes(3, ingredients=3)
+        RecipeIngredient.objects.filter(
+            recipe=self.recipes[1], ingredient=self.ingredients[2]
+        ).delete()
+
+    def search(self, *ingredients, **params):
+        return self.client.get(self.url, {
+            'ingredients': [ingredient.pk for ingredient in ingredients],
+            **params
+        })
+
+    def test_ranked_by_coverage(self):
+        response = self.search(self.ingredients[0], self.ingredients[1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['id'], self.recipes[1].pk)
+        self.assertEqual(response.data[0]['coverage'], 1.0)
+        self.assertEqual(response.data[0]['missing_ingredients'], [])
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data[1:]],
+            [self.recipes[2].pk, self.recipes[0].pk]
+        )
+        self.assertAlmostEqual(response.data[1]['coverage'], 2 / 3)
+        self.assertEqual(
+            [ingredient['id']
+             for ingredient in response.data[1]['missing_ingredients']],
+            [self.ingredients[2].pk]
+        )
+
+    def test_loads_only_card_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            self.search(self.ingredients[0])
+        for query in context.captured_queries:
+            self.assertNotIn('"snapshot"', query['sql'])
+            self.assertNotIn('"search_vector"', query['sql'])
+
+    def test_limit(self):
+        response = self.search(self.ingredients[0], limit=2)
+        self.assertEqual(len(response.data), 2)
+
+    def test_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.recipes[1], ingredient=self.ingredients[3],
+                amount=1
+            )
+        response = self.search(self.ingredients[3])
+        self.assertEqual([recipe['id'] for recipe in response.data],
+                         [self.recipes[1].pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].delete()
+        self.assertEqual(self.search(self.ingredients[3]).data, [])
+
+    def test_invalid_query(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        response = self.client.get(self.url, {'ingredients': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PantryIndexSyncTest(ApiTestCase):
+    """Другой процесс применяет журнал изменений без полной перезагрузки."""
+
+    def setUp(self):
+        super().setUp()
+        pantry_index.invalidate()
+        self.recipe = self.make_recipe(ingredients=2)
+        self.worker = PantryIndex()
+        self.worker.ensure_fresh()
+
+    def add_ingredient(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.ingredients[4], amount=1
+            )
+
+    def search(self):
+        return [recipe_id for recipe_id, _, _ in
+                self.worker.search([self.ingredients[4].pk], 10)]
+
+    def test_applies_changes(self):
+        self.add_ingredient()
+        with mock.patch.object(self.worker, 'load') as load:
+            self.assertEqual(self.search(), [self.recipe.pk])
+        load.assert_not_called()
+
+    def test_reloads_when_change_is_evicted(self):
+        self.add_ingredient()
+        cache.delete(pantry_index.change_key(
+            cache.get(pantry_index.version_key)
+        ))
+        with mock.patch.object(
+            self.worker, 'load', wraps=self.worker.load
+        ) as load:
+            self.assertEqual(self.search(), [self.recipe.pk])
+        load.assert_called_once()
+
+    @override_settings(INDEX_CHANGES_MAX_LAG=1)
+    def test_reloads_when_too_far_behind(self):
+        self.add_ingredient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_recipe(ingredients=5)
+        with mock.patch.object(
+            self.worker, 'load', wraps=self.worker.load
+        ) as load:
+            self.assertEqual(len(self.search()), 2)
+        load.assert_called_once()
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from recipes.models import Favorite, Shopping
+from users.models import SubscribeAuthor
+
+from .base import ApiTestCase
+
+
+class RecipeQueriesTest(ApiTestCase):
+    """Число запросов не зависит от размера страницы и рецепта."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.make_recipes(10, ingredients=5, tags=3)
+        for recipe in self.recipes[::2]:
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            Shopping.objects.create(user=self.user, recipe=recipe)
+        SubscribeAuthor.objects.create(user=self.user, author=self.authors[0])
+
+    def count_queries(self, url):
+        cache.clear()
+        response, queries = self.get_counted(url)
+        self.assertEqual(response.status_code, 200)
+        return response, queries
+
+    def assert_list_constant(self):
+        url = reverse('api:recipes-list')
+        response, small = self.count_queries(f'{url}?limit=2')
+        self.assertEqual(len(response.data['results']), 2)
+        response, large = self.count_queries(f'{url}?limit=10')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(small, large)
+
+    def assert_detail_constant(self):
+        small = self.make_recipe(ingredients=1, tags=1)
+        large = self.make_recipe(ingredients=5, tags=3)
+        _, small_queries = self.count_queries(
+            reverse('api:recipes-detail', kwargs={'pk': small.pk})
+        )
+        response, large_queries = self.count_queries(
+            reverse('api:recipes-detail', kwargs={'pk': large.pk})
+        )
+        self.assertEqual(len(response.data['ingredients']), 5)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_list_anonymous(self):
+        self.assert_list_constant()
+
+    def test_list_authenticated(self):
+        self.client.force_authenticate(self.user)
+        self.assert_list_constant()
+
+    def test_detail_anonymous(self):
+        self.assert_detail_constant()
+
+    def test_detail_authenticated(self):
+        self.client.force_authenticate(self.user)
+        self.assert_detail_constant()
+
+    def test_flags_authenticated(self):
+        self.client.force_authenticate(self.user)
+        response, _ = self.count_queries(
+            reverse('api:recipes-list') + '?limit=10'
+        )
+        favorited = {self.recipes[i].pk for i in range(0, 10, 2)}
+        for recipe in response.data['results']:
+            self.assertEqual(recipe['is_favorited'], recipe['id'] in favorited)
+            self.assertEqual(recipe['is_in_shopping_cart'],
+                             recipe['id'] in favorited)
+            self.assertEqual(recipe['author']['is_subscribed'],
+                             recipe['author']['id'] == self.authors[0].pk)
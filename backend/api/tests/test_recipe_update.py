@@ -0,0 +1,58 @@
+from django.urls import reverse
+
+from api.serializers import RecipeSerializer
+from recipes.models import Favorite, Recipe
+
+from .base import ApiTestCase
+
+
+class RecipeUpdateTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.make_recipe()
+        self.url = reverse('api:recipes-detail', kwargs={'pk': self.recipe.pk})
+        self.client.force_authenticate(self.recipe.author)
+
+    def payload(self, tags):
+        return {
+            'name': 'Новое имя',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': self.ingredients[0].pk, 'amount': 3},
+            ],
+        }
+
+    def found(self, tag):
+        response = self.client.get(
+            reverse('api:recipes-list'), {'tags': tag.slug}
+        )
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_patch_tags_then_filter(self):
+        response = self.client.patch(
+            self.url, self.payload(self.tags[1:]), format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(
+            sorted(recipe.tag_ids), [tag.pk for tag in self.tags[1:]]
+        )
+        self.assertEqual(recipe.name, 'Новое имя')
+        self.assertEqual(self.found(self.tags[0]), [])
+        self.assertEqual(self.found(self.tags[2]), [self.recipe.pk])
+
+    def test_keeps_denormalized_columns(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(similar_stale=False)
+        serializer = RecipeSerializer(
+            recipe, data=self.payload(self.tags[:1]), partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertTrue(recipe.similar_stale)
+        self.assertEqual(recipe.cooking_time, 10)
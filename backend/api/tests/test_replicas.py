@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.db_routers import ReplicaRouter, read_from, replica, use_primary
+from api.middleware import ReadReplicaMiddleware
+from recipes.models import Recipe
+
+from .base import ApiTestCase
+
+REPLICA = 'replica_0'
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReadReplicaMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.status = 200
+        self.aliases = []
+        self.middleware = ReadReplicaMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.aliases.append(replica.get())
+        return HttpResponse(status=self.status)
+
+    def request(self, method, token=None, status=200):
+        self.status = status
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        self.middleware(getattr(self.factory, method)('/api/', **headers))
+        return self.aliases[-1]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.request('get'), 'replica_0')
+        self.assertEqual(self.request('get', 'first'), 'replica_0')
+
+    def test_unsafe_requests_use_primary(self):
+        self.assertIsNone(self.request('post', 'first'))
+
+    def test_reads_stick_to_primary_after_write(self):
+        self.request('post', 'first', status=201)
+        self.assertIsNone(self.request('get', 'first'))
+        self.assertEqual(self.request('get', 'second'), 'replica_0')
+        self.assertEqual(self.request('get'), 'replica_0')
+
+    def test_failed_write_does_not_stick(self):
+        self.request('post', 'first', status=400)
+        self.assertEqual(self.request('get', 'first'), 'replica_0')
+
+    def test_stickiness_expires(self):
+        self.request('delete', 'first', status=204)
+        cache.delete(ReadReplicaMiddleware.primary_key(
+            self.factory.get('/', HTTP_AUTHORIZATION='Token first')
+        ))
+        self.assertEqual(self.request('get', 'first'), 'replica_0')
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    def test_routing(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        with read_from('replica_0'):
+            self.assertEqual(router.db_for_read(Recipe), 'replica_0')
+            self.assertEqual(router.db_for_write(Recipe), 'default')
+            with use_primary():
+                self.assertEqual(router.db_for_read(Recipe), 'default')
+            self.assertEqual(router.db_for_read(Recipe), 'replica_0')
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(ApiTestCase):
+    """Запросы через отдельное соединение-реплику.
+
+    Реплика — второе соединение с тестовой базой: данные теста не
+    закоммичены и ей не видны, как отставшей реплике.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings[REPLICA] = dict(
+            connections[DEFAULT_DB_ALIAS].settings_dict
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.make_recipe()
+        self.url = reverse('api:recipes-detail', kwargs={'pk': self.recipe.pk})
+
+    def login(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def get(self):
+        with CaptureQueriesContext(connections[REPLICA]) as context:
+            response = self.client.get(self.url)
+        return response.status_code, len(context.captured_queries) > 0
+
+    def test_reads_go_to_replica_until_own_write(self):
+        self.login(self.user)
+        self.assertEqual(self.get(), (404, True))
+        response = self.client.post(
+            reverse('api:recipes-favorite', kwargs={'pk': self.recipe.pk})
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get(), (200, False))
+        self.login(self.authors[1])
+        self.assertEqual(self.get(), (404, True))
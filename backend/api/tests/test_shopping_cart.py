@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.urls import reverse
+
+from recipes.models import RecipeIngredient, Shopping
+
+from .base import ApiTestCase
+
+
+class ShoppingCartTest(ApiTestCase):
+    url = reverse('api:recipes-download-shopping-cart')
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.make_recipes(2)
+        for recipe in self.recipes:
+            Shopping.objects.create(user=self.user, recipe=recipe)
+        self.client.force_authenticate(self.user)
+
+    def test_download_is_streamed(self):
+        for renderer_format, expected in (
+            ('txt', 'ингредиент 0. Кол-во для рецептов 4'),
+            ('csv', 'ингредиент 0,г,4'),
+            ('json', '"amount": 4'),
+        ):
+            with self.subTest(renderer_format):
+                response = self.client.get(
+                    self.url, {'format': renderer_format}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.streaming)
+                self.assertIn(
+                    expected, b''.join(response.streaming_content).decode()
+                )
+
+    def test_totals_follow_recipe_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(
+                recipe=self.recipes[0], ingredient=self.ingredients[0]
+            ).update(amount=10)
+            RecipeIngredient.objects.create(
+                recipe=self.recipes[0], ingredient=self.ingredients[4],
+                amount=1
+            )
+        totals = {
+            item['name']: item['amount'] for item in
+            self.client.get(reverse('api:recipes-shopping-list')).data
+        }
+        self.assertEqual(totals['ингредиент 0'], 12)
+        self.assertEqual(totals['ингредиент 4'], 1)
+
+    def test_refresh_once_per_recipe(self):
+        with mock.patch('recipes.signals.refresh_recipe') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for ingredient in self.ingredients[3:]:
+                    RecipeIngredient.objects.create(
+                        recipe=self.recipes[0], ingredient=ingredient,
+                        amount=1
+                    )
+                RecipeIngredient.objects.filter(
+                    recipe=self.recipes[0], ingredient=self.ingredients[0]
+                ).delete()
+        refresh.assert_called_once_with(self.recipes[0].pk)
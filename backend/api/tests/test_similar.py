@@ -0,0 +1,104 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from recipes import similarity
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+
+from .base import ApiTestCase
+
+MISSING = 2 ** 31 - 1
+
+
+class SimilarRecipesTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipes = [
+            self.make_recipe(0),
+            self.make_recipe(1),
+            self.make_recipe(2, ingredients=1, tags=3),
+        ]
+
+    def build(self, *args):
+        call_command('build_similar_recipes', *args, stdout=StringIO())
+
+    def similar(self, recipe):
+        response = self.client.get(
+            reverse('api:recipes-similar', kwargs={'pk': recipe.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def stale(self):
+        return set(Recipe.objects.filter(
+            similar_stale=True
+        ).values_list('id', flat=True))
+
+    def test_endpoint(self):
+        self.build()
+        self.assertEqual(self.stale(), set())
+        data = self.similar(self.recipes[0])
+        self.assertEqual(
+            [item['id'] for item in data],
+            [self.recipes[1].pk, self.recipes[2].pk]
+        )
+        self.assertAlmostEqual(data[0]['score'], 1)
+        self.assertLess(data[1]['score'], data[0]['score'])
+        for pk in (MISSING, 'abc', '0', '-1'):
+            response = self.client.get(
+                reverse('api:recipes-similar', kwargs={'pk': pk})
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_refresh_changed(self):
+        self.build()
+        recipe = self.make_recipe(3)
+        self.assertEqual(self.stale(), {recipe.pk})
+        self.build('--changed')
+        self.assertEqual(self.stale(), set())
+        self.assertIn(
+            recipe.pk, [item['id'] for item in self.similar(self.recipes[0])]
+        )
+        self.assertEqual(
+            [item['id'] for item in self.similar(recipe)][:2],
+            [self.recipes[0].pk, self.recipes[1].pk]
+        )
+
+    def test_failed_refresh_keeps_marks(self):
+        self.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[2].tags.set(self.tags[:1])
+        self.assertEqual(self.stale(), {self.recipes[2].pk})
+        for args in ((), ('--changed',)):
+            with self.subTest(args=args), mock.patch(
+                'recipes.similarity.write', side_effect=RuntimeError
+            ):
+                with self.assertRaises(RuntimeError):
+                    self.build(*args)
+                self.assertEqual(self.stale(), {self.recipes[2].pk})
+                self.assertTrue(SimilarRecipe.objects.exists())
+
+    def test_edit_during_refresh_stays_marked(self):
+        self.build()
+        recipe = self.make_recipe(3)
+        read_matrix = similarity.SimilarityMatrix
+
+        def read_then_edit():
+            try:
+                return read_matrix()
+            finally:
+                RecipeIngredient.objects.filter(
+                    recipe=recipe
+                ).first().delete()
+
+        for args in (('--changed',), ()):
+            with self.subTest(args=args), mock.patch(
+                'recipes.similarity.SimilarityMatrix',
+                side_effect=read_then_edit
+            ):
+                self.build(*args)
+                self.assertEqual(self.stale(), {recipe.pk})
+        self.build('--changed')
+        self.assertEqual(self.stale(), set())
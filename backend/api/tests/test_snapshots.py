@@ -0,0 +1,72 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api import snapshots
+from recipes.models import Recipe
+
+from .base import ApiTestCase
+
+
+class RecipeSnapshotTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.make_recipe()
+        self.url = reverse('api:recipes-detail', kwargs={'pk': self.recipe.pk})
+
+    def snapshot(self):
+        return Recipe.objects.get(pk=self.recipe.pk).snapshot
+
+    def test_rendered_after_commit(self):
+        self.assertEqual(self.snapshot()['name'], 'Рецепт 0')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое имя'
+            self.recipe.save()
+        self.assertEqual(self.snapshot()['name'], 'Новое имя')
+
+    def test_save_clears_snapshot_in_one_update(self):
+        self.recipe.name = 'Новое имя'
+        with CaptureQueriesContext(connection) as context:
+            self.recipe.save()
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIsNone(self.snapshot())
+
+    def rename_tag(self):
+        with mock.patch.object(snapshots.executor, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.tags[0].name = 'другой тег'
+                self.tags[0].save()
+        return submit
+
+    def test_read_does_not_write(self):
+        self.rename_tag()
+        self.assertIsNone(self.snapshot())
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tags'][0]['name'], 'другой тег')
+        for query in context.captured_queries:
+            self.assertFalse(query['sql'].startswith('UPDATE'))
+            self.assertNotIn('FOR UPDATE', query['sql'])
+        self.assertIsNone(self.snapshot())
+        call_command('render_recipe_snapshots', stdout=StringIO())
+        self.assertEqual(self.snapshot()['tags'][0]['name'], 'другой тег')
+
+    def test_bulk_change_rendered_in_background(self):
+        submit = self.rename_tag()
+        submit.assert_called_once_with(
+            snapshots._render_expired_task, [self.recipe.pk]
+        )
+        task, recipe_ids = submit.call_args.args
+        # Задача закрывает соединение своего потока, а не теста.
+        with mock.patch.object(snapshots, 'connection'):
+            task(recipe_ids)
+        self.assertEqual(self.snapshot()['tags'][0]['name'], 'другой тег')
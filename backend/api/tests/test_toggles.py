@@ -0,0 +1,73 @@
+from django.urls import reverse
+
+from recipes.models import Favorite, Recipe, Shopping
+from recipes.relations import add_relation, relations_added
+from users.models import SubscribeAuthor, User
+
+from .base import ApiTestCase
+
+MISSING = 2 ** 31 - 1
+
+
+class ToggleTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.make_recipe()
+        self.client.force_authenticate(self.user)
+
+    def assert_recipe_toggle(self, action, model, counter):
+        url = reverse(f'api:recipes-{action}', kwargs={'pk': self.recipe.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], self.recipe.pk)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(getattr(self.recipe, counter), 1)
+        self.assertEqual(model.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(getattr(self.recipe, counter), 0)
+        missing = reverse(f'api:recipes-{action}', kwargs={'pk': MISSING})
+        self.assertEqual(self.client.post(missing).status_code, 400)
+        self.assertEqual(self.client.delete(missing).status_code, 400)
+
+    def test_favorite(self):
+        self.assert_recipe_toggle('favorite', Favorite, 'favorites_count')
+
+    def test_shopping_cart(self):
+        self.assert_recipe_toggle(
+            'shopping-cart', Shopping, 'carts_count'
+        )
+
+    def test_subscribe(self):
+        author = self.authors[0]
+        url = reverse('api:users-subscribe', kwargs={'id': author.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['is_subscribed'])
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(User.objects.get(pk=author.pk).followers_count, 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(User.objects.get(pk=author.pk).followers_count, 0)
+        own = reverse('api:users-subscribe', kwargs={'id': self.user.pk})
+        self.assertEqual(self.client.post(own).status_code, 400)
+        missing = reverse('api:users-subscribe', kwargs={'id': MISSING})
+        self.assertEqual(self.client.post(missing).status_code, 404)
+        self.assertFalse(SubscribeAuthor.objects.exists())
+
+    def test_failed_receiver_rolls_back(self):
+        def fail(**kwargs):
+            raise RuntimeError
+
+        relations_added.connect(fail, sender=Favorite)
+        try:
+            with self.assertRaises(RuntimeError):
+                add_relation(Favorite, self.user.pk, 'recipe', self.recipe.pk)
+        finally:
+            relations_added.disconnect(fail, sender=Favorite)
+        self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).favorites_count, 0
+        )
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from api.user_relations import EMPTY, IdSet, get_user_relations
+
+from .base import ApiTestCase
+
+
+class IdSetTest(SimpleTestCase):
+    def test_membership(self):
+        ids = IdSet([7, 3, 5])
+        self.assertEqual(list(ids), [3, 5, 7])
+        self.assertEqual(len(ids), 3)
+        self.assertIn(5, ids)
+        for missing in (1, 4, 8):
+            self.assertNotIn(missing, ids)
+        self.assertNotIn(1, IdSet())
+
+
+class UserRelationsTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.make_recipe()
+        self.url = reverse('api:recipes-detail', kwargs={'pk': self.recipe.pk})
+        self.client.force_authenticate(self.user)
+
+    def flags(self):
+        data = self.client.get(self.url).data
+        return (data['is_favorited'], data['is_in_shopping_cart'],
+                data['author']['is_subscribed'])
+
+    def toggle(self, method, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 300)
+
+    def test_flags_follow_toggles(self):
+        self.assertEqual(self.flags(), (False, False, False))
+        urls = (
+            reverse('api:recipes-favorite', kwargs={'pk': self.recipe.pk}),
+            reverse('api:recipes-shopping-cart',
+                    kwargs={'pk': self.recipe.pk}),
+            reverse('api:users-subscribe',
+                    kwargs={'id': self.recipe.author_id}),
+        )
+        for url in urls:
+            self.toggle('post', url)
+        self.assertEqual(self.flags(), (True, True, True))
+        for url in urls:
+            self.toggle('delete', url)
+        self.assertEqual(self.flags(), (False, False, False))
+
+    def test_relations_are_cached(self):
+        self.assertIs(get_user_relations(AnonymousUser()), EMPTY)
+        relations = get_user_relations(self.user)
+        self.assertEqual(len(relations.favorites), 0)
+        with self.assertNumQueries(0):
+            get_user_relations(self.user)
+        self.toggle('post', reverse(
+            'api:recipes-favorite', kwargs={'pk': self.recipe.pk}
+        ))
+        self.assertIn(self.recipe.pk, get_user_relations(self.user).favorites)
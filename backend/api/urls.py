@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -15,3 +16,15 @@ urlpatterns = [
     path('', include(router_v1.urls)),
     path('auth/', include('djoser.urls.authtoken'))
 ]
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    urlpatterns = [
+        path('tags/', async_views.tags_list),
+        path('tags/<int:pk>/', async_views.tags_detail),
+        path('ingredients/', async_views.ingredients_list),
+        path('ingredients/<int:pk>/', async_views.ingredients_detail),
+        path('recipes/', async_views.recipes_list),
+        path('recipes/<int:pk>/', async_views.recipes_detail),
+    ] + urlpatterns
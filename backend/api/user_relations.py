@@ -0,0 +1,100 @@
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+
+from recipes.models import Favorite, Shopping
+from users.models import SubscribeAuthor
+
+from .db_routers import use_primary
+
+VERSION_KEY = 'user_relations_version:{}'
+RELATIONS_KEY = 'user_relations:{}:{}'
+RELATIONS = (
+    (Favorite, 'recipe_id'),
+    (Shopping, 'recipe_id'),
+    (SubscribeAuthor, 'author_id'),
+)
+
+UserRelations = namedtuple(
+    'UserRelations', ('favorites', 'shopping_cart', 'following')
+)
+
+
+class IdSet:
+    """Множество идентификаторов в отсортированном массиве int32.
+
+    Занимает 4 байта на элемент, проверка вхождения — двоичный поиск.
+    """
+
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=()):
+        self.ids = array('i', sorted(ids))
+
+    def __contains__(self, pk):
+        index = bisect_left(self.ids, pk)
+        return index < len(self.ids) and self.ids[index] == pk
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+EMPTY = UserRelations(IdSet(), IdSet(), IdSet())
+
+
+def load_user_relations(user_id):
+    querysets = [
+        model.objects.filter(user_id=user_id).annotate(
+            kind=Value(kind, output_field=IntegerField())
+        ).values_list('kind', field)
+        for kind, (model, field) in enumerate(RELATIONS)
+    ]
+    ids = [[] for _ in RELATIONS]
+    with use_primary():
+        for kind, pk in querysets[0].union(*querysets[1:], all=True):
+            ids[kind].append(pk)
+    return UserRelations(*map(IdSet, ids))
+
+
+def get_user_relations(user):
+    """Избранное, список покупок и подписки пользователя из общего кэша.
+
+    Ключ содержит версию, которую сдвигает каждое изменение после
+    коммита: набор, прочитанный до коммита, остаётся под старой версией.
+    Версия живёт в общем кэше, поэтому сдвиг видят все воркеры; короткий
+    USER_RELATIONS_TIMEOUT ограничивает ошибку, если сдвиг потерян.
+    """
+    if user.is_anonymous:
+        return EMPTY
+    version = cache.get_or_set(VERSION_KEY.format(user.pk), time.time_ns,
+                               None)
+    key = RELATIONS_KEY.format(user.pk, version)
+    relations = cache.get(key)
+    if relations is None:
+        relations = load_user_relations(user.pk)
+        cache.set(key, relations, settings.USER_RELATIONS_TIMEOUT)
+    return relations
+
+
+def get_request_relations(request):
+    if request is None:
+        return EMPTY
+    if not hasattr(request, 'user_relations'):
+        request.user_relations = get_user_relations(request.user)
+    return request.user_relations
+
+
+def forget_user_relations(user_id):
+    key = VERSION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
@@ -1,24 +1,93 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import csv
+import json
 
-from recipes.models import RecipeIngredient
+from django.http import StreamingHttpResponse
 
+from recipes.relations import add_relations, remove_relations
+from recipes.shopping_cart import get_shopping_list
 
-def create_shopping_cart(user):
-    shopping_list = RecipeIngredient.objects.filter(
-        recipe__shopping_cart__user=user).values(
-        'ingredient__name',
-        'ingredient__measurement_unit'
-    ).annotate(
-        amount_total=Sum('amount')
-    ).order_by()
+PK_MAX = 2 ** 31 - 1
 
-    result_string = 'Список покупок: \n '
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if limit and limit.isdigit():
+        return int(limit)
+    return None
+
+
+def get_related_pk(value):
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        return None
+    return pk if 0 < pk <= PK_MAX else None
+
+
+def apply_batch(request, model, field, ids, found):
+    """Добавляет или удаляет связи пользователя и возвращает итог по id."""
+    action = add_relations if request.method == 'POST' else remove_relations
+    statuses = (
+        ('added', 'exists') if request.method == 'POST'
+        else ('removed', 'absent')
+    )
+    changed = set(action(
+        model, request.user.id, field, [pk for pk in ids if pk in found]
+    ))
+    return {
+        pk: statuses[pk not in changed] if pk in found else 'not_found'
+        for pk in ids
+    }
+
+
+def shopping_cart_txt(shopping_list):
+    yield 'Список покупок: \n '
     for count, ingredient in enumerate(shopping_list, start=1):
-        result_string += (
-            f'{count}. {ingredient["ingredient__name"]}. '
-            f'Кол-во для рецептов {ingredient["amount_total"]} '
-            f'{ingredient["ingredient__measurement_unit"]} \n '
+        yield (
+            f'{count}. {ingredient["name"]}. '
+            f'Кол-во для рецептов {ingredient["amount"]} '
+            f'{ingredient["measurement_unit"]} \n '
         )
 
-    return HttpResponse(result_string, content_type='text/plain')
+
+def shopping_cart_csv(shopping_list):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in shopping_list:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['amount'],
+        ))
+
+
+def shopping_cart_json(shopping_list):
+    yield '['
+    for count, ingredient in enumerate(shopping_list):
+        yield (',' if count else '') + json.dumps(
+            ingredient, ensure_ascii=False
+        )
+    yield ']'
+
+
+SHOPPING_CART_WRITERS = {
+    'txt': shopping_cart_txt,
+    'csv': shopping_cart_csv,
+    'json': shopping_cart_json,
+}
+
+
+def create_shopping_cart(user, renderer):
+    response = StreamingHttpResponse(
+        SHOPPING_CART_WRITERS[renderer.format](get_shopping_list(user)),
+        content_type=f'{renderer.media_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_cart.{renderer.format}"'
+    )
+    return response
@@ -1,26 +1,55 @@
 from django.contrib.auth import get_user_model
+from django.db.models import (BooleanField, F, OuterRef, Prefetch, Subquery,
+                              Value)
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.fields import empty
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.response import Response
 
 from recipes.models import Favorite, Ingredient, Recipe, Shopping, Tag
+from recipes.relations import add_relation, remove_relation
+from recipes.shopping_cart import get_shopping_list
 from users.models import SubscribeAuthor
+
+from .cache import CachedResponseMixin
 from .filters import IngredientFilter, RecipeFilter
+from .ingredient_index import ingredient_index
 from .mixins import ListRetrieveViewSet
 from .pagination import CustomPagination
+from .pantry_index import pantry_index
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (CartSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeGetSerializer,
-                          RecipeSerializer, SubscriptionListSerializer,
-                          SubscriptionSerializer, TagSerializer)
-from .utils import create_shopping_cart
+from .renderers import SHOPPING_CART_RENDERERS
+from .serializers import (BatchSerializer, FavoriteRecipeSerializer,
+                          IngredientSerializer, PantryQuerySerializer,
+                          PantryRecipeSerializer, RecipeOverlaySerializer,
+                          RecipeSerializer, SimilarRecipeSerializer,
+                          SubscriptionListSerializer, TagSerializer)
+from .snapshots import fill_snapshots
+from .utils import (apply_batch, create_shopping_cart, get_recipes_limit,
+                    get_related_pk)
 
 User = get_user_model()
 
+RELATED_RECIPE_FIELDS = (
+    'id', 'name', 'image', 'image_renditions', 'cooking_time'
+)
+SUBSCRIPTION_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'recipes_count'
+)
+RELATION_ERRORS = {
+    Favorite: ('Уже есть в избранном.', 'Избранное не существует.'),
+    Shopping: ('Рецепт уже в списке покупок', 'Рецепта нет в списке покупок'),
+}
+SUBSCRIBE_ERRORS = {
+    'POST': ('На себя подписываться нельзя.', 'Вы уже подписаны.'),
+    'DELETE': ('Нельзя отписаться от самого себя.', 'Вы не подписаны.'),
+}
+
 
 class UserViewSet(UserViewSet):
     pagination_class = CustomPagination
@@ -31,45 +60,84 @@ class UserViewSet(UserViewSet):
         methods=('POST', 'DELETE')
     )
     def subscribe(self, request, id=None):
+        author_id = get_related_pk(id)
+        if author_id is None:
+            raise NotFound
+        if author_id == request.user.id:
+            raise ValidationError({'errors': [
+                SUBSCRIBE_ERRORS[request.method][0]
+            ]})
         if request.method == 'POST':
-            serializer = SubscriptionSerializer(
-                data={
-                    'user': request.user.id,
-                    'author': get_object_or_404(User, id=id).id
-                },
-                context={'request': request}
+            result = add_relation(
+                SubscribeAuthor, request.user.id, 'author', author_id,
+                SUBSCRIPTION_FIELDS
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        serializer = SubscriptionSerializer(
-            data={
-                'user': request.user.id,
-                'author': get_object_or_404(User, id=id).id
-            },
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        subscription = get_object_or_404(
-            SubscribeAuthor,
-            author=get_object_or_404(User, id=id),
-            user=request.user
-        )
-        self.perform_destroy(subscription)
+        else:
+            result = remove_relation(
+                SubscribeAuthor, request.user.id, 'author', author_id
+            )
+        if result is None:
+            raise NotFound
+        if request.method == 'DELETE':
+            if not result:
+                raise ValidationError({'errors': [
+                    SUBSCRIBE_ERRORS['DELETE'][1]
+                ]})
+            return Response(
+                'Вы успешно отписались',
+                status=status.HTTP_204_NO_CONTENT
+            )
+        author, added = result
+        if not added:
+            raise ValidationError({'errors': [SUBSCRIBE_ERRORS['POST'][1]]})
+        author.is_subscribed = True
         return Response(
-            'Вы успешно отписались',
-            status=status.HTTP_204_NO_CONTENT
+            SubscriptionListSerializer(
+                author, context={'request': request}
+            ).data,
+            status=status.HTTP_201_CREATED
         )
 
+    @action(
+        detail=False,
+        url_path='subscribe',
+        permission_classes=[IsAuthenticated],
+        methods=('POST', 'DELETE')
+    )
+    def subscribe_batch(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        found = set(User.objects.filter(id__in=ids).exclude(
+            id=request.user.id
+        ).values_list('id', flat=True))
+        results = apply_batch(request, SubscribeAuthor, 'author', ids, found)
+        if request.user.id in results:
+            results[request.user.id] = 'self'
+        return Response({'results': results})
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated],
         methods=('GET',)
     )
     def subscriptions(self, request):
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_renditions', 'cooking_time', 'author'
+        )
+        limit = get_recipes_limit(request)
+        if limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-id').values('id')[:limit]
+            ))
         subscriptions = self.paginate_queryset(
-            User.objects.filter(following__user=request.user)
+            User.objects.filter(following__user=request.user).annotate(
+                is_subscribed=Value(True, output_field=BooleanField())
+            ).prefetch_related(
+                Prefetch('recipe', queryset=recipes, to_attr='limited_recipes')
+            ).order_by('-id')
         )
         serializer = SubscriptionListSerializer(
             subscriptions, many=True, context={'request': request}
@@ -77,24 +145,45 @@ class UserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(ListRetrieveViewSet):
+class IngredientViewSet(CachedResponseMixin, ListRetrieveViewSet):
+    cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name))
 
-class TagViewSet(ListRetrieveViewSet):
+
+class TagViewSet(CachedResponseMixin, ListRetrieveViewSet):
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_namespace = 'recipes'
+    cache_anonymous_only = True
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        return queryset.only('id', 'snapshot')
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            fill_snapshots(args[0] if kwargs.get('many') else args[:1])
+        return super().get_serializer(*args, **kwargs)
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
@@ -108,40 +197,52 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
-            return RecipeGetSerializer
+            return RecipeOverlaySerializer
         return RecipeSerializer
 
     def get_permissions(self):
-        if self.action != 'create':
+        if self.action not in (
+            'create', 'download_shopping_cart', 'shopping_list',
+            'favorite_batch', 'shopping_cart_batch',
+        ):
             return (IsAuthorOrReadOnly(),)
         return super().get_permissions()
 
     @staticmethod
-    def __add_object_action(request, pk, serializer_in_view):
-        data = {'user': request.user.id, 'recipe': pk}
-        serializer = serializer_in_view(
-            data=data,
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def __recipe_not_found(pk):
+        return ValidationError({'recipe': [
+            PrimaryKeyRelatedField.default_error_messages[
+                'does_not_exist'
+            ].format(pk_value=pk)
+        ]}, code='does_not_exist')
 
-    @staticmethod
-    def __del_object_action(request, pk, serializer_in_view, model):
-        data = {'user': request.user.id, 'recipe': pk}
-        serializer = serializer_in_view(
-            data=data,
-            context={'request': request}
+    def __add_object_action(self, request, pk, model):
+        recipe_id = get_related_pk(pk)
+        result = recipe_id and add_relation(
+            model, request.user.id, 'recipe', recipe_id,
+            RELATED_RECIPE_FIELDS
         )
-        serializer.is_valid(raise_exception=True)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model_instance = get_object_or_404(
-            model,
-            user=request.user,
-            recipe=recipe
+        if not result:
+            raise self.__recipe_not_found(pk)
+        recipe, added = result
+        if not added:
+            raise ValidationError({'errors': [RELATION_ERRORS[model][0]]})
+        return Response(
+            FavoriteRecipeSerializer(
+                recipe, context={'request': request}
+            ).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def __del_object_action(self, request, pk, model):
+        recipe_id = get_related_pk(pk)
+        removed = recipe_id and remove_relation(
+            model, request.user.id, 'recipe', recipe_id
         )
-        model_instance.delete()
+        if removed is None or recipe_id is None:
+            raise self.__recipe_not_found(pk)
+        if not removed:
+            raise ValidationError({'errors': [RELATION_ERRORS[model][1]]})
         return Response(
             'Успешно удалено',
             status=status.HTTP_204_NO_CONTENT
@@ -149,34 +250,115 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=('POST',),)
     def favorite(self, request, pk):
-        return self.__add_object_action(request, pk, FavoriteSerializer)
+        return self.__add_object_action(request, pk, Favorite)
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
-        return self.__del_object_action(
-            request,
-            pk,
-            FavoriteSerializer,
-            Favorite
-        )
+        return self.__del_object_action(request, pk, Favorite)
 
     @action(detail=True, methods=('POST',),)
     def shopping_cart(self, request, pk):
-        return self.__add_object_action(request, pk, CartSerializer)
+        return self.__add_object_action(request, pk, Shopping)
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
-        return self.__del_object_action(
-            request,
-            pk,
-            CartSerializer,
-            Shopping
-        )
+        return self.__del_object_action(request, pk, Shopping)
 
     @action(
         methods=('GET',),
         detail=False,
         permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_CART_RENDERERS,
     )
     def download_shopping_cart(self, request):
-        return create_shopping_cart(user=request.user)
+        return create_shopping_cart(
+            user=request.user,
+            renderer=request.accepted_renderer
+        )
+
+    @staticmethod
+    def __batch_action(request, model):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        found = set(Recipe.objects.filter(id__in=ids).values_list(
+            'id', flat=True
+        ))
+        return Response({
+            'results': apply_batch(request, model, 'recipe', ids, found)
+        })
+
+    @action(
+        methods=('POST', 'DELETE'),
+        detail=False,
+        url_path='favorite',
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_batch(self, request):
+        return self.__batch_action(request, Favorite)
+
+    @action(
+        methods=('POST', 'DELETE'),
+        detail=False,
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_batch(self, request):
+        return self.__batch_action(request, Shopping)
+
+    @action(
+        methods=('GET',),
+        detail=False,
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_list(self, request):
+        return Response(get_shopping_list(request.user))
+
+    @action(methods=('GET',), detail=True)
+    def similar(self, request, pk):
+        recipe_id = get_related_pk(pk)
+        if recipe_id is None:
+            raise NotFound
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=recipe_id
+        ).annotate(
+            score=F('similar_to__score')
+        ).only(*RELATED_RECIPE_FIELDS).order_by('-score', 'id')
+        data = SimilarRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+        if not data and not Recipe.objects.filter(id=recipe_id).exists():
+            raise NotFound
+        return Response(data)
+
+    @action(methods=('GET',), detail=False)
+    def pantry(self, request):
+        query = PantryQuerySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            'limit': request.query_params.get('limit', empty),
+        })
+        query.is_valid(raise_exception=True)
+        ranked = pantry_index.search(
+            query.validated_data['ingredients'],
+            query.validated_data['limit']
+        )
+        recipes = Recipe.objects.only(*RELATED_RECIPE_FIELDS).in_bulk(
+            [recipe_id for recipe_id, _, _ in ranked]
+        )
+        ingredients = Ingredient.objects.in_bulk({
+            ingredient_id
+            for _, _, missing in ranked for ingredient_id in missing
+        })
+        result = []
+        for recipe_id, coverage, missing in ranked:
+            if recipe_id not in recipes:
+                continue
+            recipe = recipes[recipe_id]
+            recipe.coverage = coverage
+            recipe.missing_ingredients = [
+                ingredients[ingredient_id] for ingredient_id in missing
+            ]
+            result.append(recipe)
+        return Response(PantryRecipeSerializer(
+            result, many=True, context={'request': request}
+        ).data)
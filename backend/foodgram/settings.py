@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_yasg',
@@ -37,6 +38,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ReadReplicaMiddleware',
+    'api.middleware.SQLInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -65,7 +68,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS':
     'rest_framework.pagination.PageNumberPagination',
@@ -74,6 +77,8 @@ REST_FRAMEWORK = {
 }
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False') == 'True'
 
 DATABASES = {
     'default': {
@@ -86,6 +91,50 @@ DATABASES = {
     }
 }
 
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', default='').split(','))
+):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{number}'] = dict(
+        DATABASES['default'],
+        HOST=host,
+        PORT=port or DATABASES['default']['PORT'],
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['api.db_routers.ReplicaRouter']
+READ_YOUR_WRITES_WINDOW = int(os.getenv('READ_YOUR_WRITES_WINDOW', 5))
+
+# Версии кэша ответов, токены, связи пользователей и журналы изменений
+# индексов должны быть видны всем процессам: без DEBUG по умолчанию
+# используется общий memcached, LocMemCache годится только для одного
+# процесса (gunicorn.conf.py не запустит с ним несколько воркеров).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.memcached.PyMemcacheCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', '' if DEBUG else 'memcached:11211'
+        ),
+    }
+}
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 60 * 5))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 60))
+USER_RELATIONS_TIMEOUT = int(os.getenv('USER_RELATIONS_TIMEOUT', 60 * 5))
+
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', default='False') == 'True'
+SQL_INSTRUMENTATION_SLOW_MS = int(os.getenv('SQL_INSTRUMENTATION_SLOW_MS', 500))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -120,6 +169,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
+# Тесты загружают изображения во временный MEDIA_ROOT.
+TEST_RUNNER = 'foodgram.test_runner.TemporaryMediaTestRunner'
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -141,3 +193,16 @@ INGREDIENT_AMOUNT_MIN = 0.1
 INGREDIENT_AMOUNT_ERROR = 'Ингредиент не может быть пустым'
 COOKING_TIME_MIN = 1
 COOKING_TIME_ERROR = 'Минимальное время приготовления 1 мин.'
+BATCH_MAX_SIZE = 100
+INGREDIENT_SEARCH_LIMIT = 50
+INDEX_CHANGES_MAX_LAG = 1000
+INDEX_CHANGES_TIMEOUT = 60 * 60
+SIMILAR_RECIPES_LIMIT = 10
+
+RECIPE_IMAGE_RENDITIONS = {
+    'card': (480, 320),
+    'detail': (960, 640),
+    'retina': (1920, 1280),
+}
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = 2
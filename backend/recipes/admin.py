@@ -19,16 +19,10 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('author', 'name', 'favorites')
+    list_display = ('author', 'name', 'favorites_count')
     search_fields = ('name', )
     list_filter = ('author', 'name', 'tags',)
 
-    @admin.display(
-        description='Кол-во добавлений в избранное',
-    )
-    def favorites(self, obj):
-        return obj.favorites.count()
-
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -0,0 +1,73 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image
+
+from .models import Recipe
+
+RENDITIONS_DIR = 'static/recipe/renditions/'
+IMAGE_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=settings.RECIPE_IMAGE_WORKERS)
+
+
+def render_renditions(image):
+    with image.storage.open(image.name) as f:
+        source = Image.open(f)
+        source.load()
+    source = source.convert('RGB')
+    stem = os.path.splitext(os.path.basename(image.name))[0]
+    renditions = {'source': image.name}
+    for rendition, size in settings.RECIPE_IMAGE_RENDITIONS.items():
+        resized = source.copy()
+        resized.thumbnail(size)
+        for extension, image_format in IMAGE_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, image_format,
+                         quality=settings.RECIPE_IMAGE_QUALITY)
+            renditions.setdefault(rendition, {})[extension] = (
+                image.storage.save(
+                    f'{RENDITIONS_DIR}{stem}_{rendition}.{extension}',
+                    ContentFile(buffer.getvalue())
+                )
+            )
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for rendition in settings.RECIPE_IMAGE_RENDITIONS:
+        for name in renditions.get(rendition, {}).values():
+            storage.delete(name)
+
+
+def update_renditions(recipe_id):
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    previous = recipe.image_renditions
+    recipe.image_renditions = render_renditions(recipe.image)
+    recipe.save(update_fields=('image_renditions',))
+    delete_renditions(recipe.image.storage, previous)
+
+
+def _update_renditions_task(recipe_id):
+    try:
+        update_renditions(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(recipe):
+    transaction.on_commit(
+        lambda: executor.submit(_update_renditions_task, recipe.id)
+    )
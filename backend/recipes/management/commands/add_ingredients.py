@@ -1,34 +1,9 @@
-import csv
-import logging
-import os
-
-from django.conf import settings
-from django.core.management.base import BaseCommand
-
+from recipes.management.loaders import BulkLoadCommand
 from recipes.models import Ingredient
 
-DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
-
-logger = logging.getLogger(__name__)
 
-
-class Command(BaseCommand):
+class Command(BulkLoadCommand):
     help = 'Загрузка ингридиентов в БД'
-
-    def add_arguments(self, parser):
-        parser.add_argument('filename', default='ingredients.csv', nargs='?',
-                            type=str)
-
-    def handle(self, *args, **options):
-        try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as f:
-                data = csv.reader(f)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
-        except Exception as error:
-            logger.error(error)
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+    default_filename = 'ingredients.csv'
@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from api.filters import SEARCH_CONFIG
+from recipes.models import Ingredient, Recipe
+
+User = get_user_model()
+
+VERBS = (
+    'нарезать', 'обжарить', 'потушить', 'запечь', 'смешать', 'посолить',
+    'добавить', 'варить', 'охладить', 'подавать', 'взбить', 'посыпать',
+)
+
+
+class Command(BaseCommand):
+    help = 'Сравнение полнотекстового поиска рецептов с icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', default=100000, type=int)
+        parser.add_argument('--queries', default=20, type=int)
+        parser.add_argument('--limit', default=6, type=int)
+        parser.add_argument('--seed', default=0, type=int)
+
+    def seed(self, options, vocabulary):
+        rnd = random.Random(options['seed'])
+        author = User.objects.create(
+            username='bench_search', email='bench_search@example.com'
+        )
+        for start in range(0, options['recipes'], 5000):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=' '.join(rnd.sample(vocabulary, 3)),
+                    text=' '.join(
+                        rnd.choice(VERBS) + ' ' + rnd.choice(vocabulary)
+                        for _ in range(30)
+                    ),
+                    cooking_time=rnd.randint(1, 180),
+                ) for _ in range(min(5000, options['recipes'] - start))
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE recipes_recipe')
+        return rnd
+
+    @staticmethod
+    def measure(build, words, limit):
+        timings = []
+        for word in words:
+            started = time.perf_counter()
+            list(build(word)[:limit])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), max(timings)
+
+    def handle(self, *args, **options):
+        vocabulary = list(
+            Ingredient.objects.values_list('name', flat=True)[:500]
+        ) or ['курица', 'картофель', 'морковь', 'сыр', 'лук', 'рис']
+        with transaction.atomic():
+            rnd = self.seed(options, vocabulary)
+            words = [
+                rnd.choice(vocabulary).split()[0]
+                for _ in range(options['queries'])
+            ]
+            results = {
+                'icontains': self.measure(
+                    lambda word: Recipe.objects.filter(
+                        Q(name__icontains=word) | Q(text__icontains=word)
+                    ), words, options['limit']
+                ),
+                'tsvector': self.measure(
+                    lambda word: Recipe.objects.filter(
+                        search_vector=SearchQuery(word, config=SEARCH_CONFIG)
+                    ).annotate(rank=SearchRank(
+                        F('search_vector'),
+                        SearchQuery(word, config=SEARCH_CONFIG)
+                    )).order_by('-rank', '-id'), words, options['limit']
+                ),
+            }
+            transaction.set_rollback(True)
+        for name, (median, worst) in results.items():
+            self.stdout.write(
+                f'{name}: медиана {median:.2f} мс, максимум {worst:.2f} мс'
+            )
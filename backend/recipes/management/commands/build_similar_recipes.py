@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.similarity import build_similar_recipes, refresh_similar_recipes
+
+
+class Command(BaseCommand):
+    help = 'Расчёт похожих рецептов по ингредиентам и тегам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--changed', action='store_true',
+                            help='Пересчитать только изменённые рецепты '
+                                 'и задетые ими списки')
+        parser.add_argument('--limit', type=int,
+                            default=settings.SIMILAR_RECIPES_LIMIT,
+                            help='Похожих рецептов на рецепт')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Расчёт работает только с PostgreSQL')
+        started = time.monotonic()
+        if options['changed']:
+            written = refresh_similar_recipes(options['limit'])
+        else:
+            written = build_similar_recipes(options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано пар: {written} за {time.monotonic() - started:.1f} с'
+        ))
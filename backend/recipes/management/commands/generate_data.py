@@ -0,0 +1,276 @@
+import io
+import time
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from PIL import Image
+
+from api.cache import invalidate
+from api.pantry_index import pantry_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            Shopping, ShoppingCartSummary, Tag)
+from recipes.shopping_cart import rebuild
+from users.models import SubscribeAuthor
+
+User = get_user_model()
+
+BLOCK_SIZE = 10000
+
+WORDS = (
+    'домашний', 'быстрый', 'праздничный', 'летний', 'острый', 'нежный',
+    'запечённый', 'тушёный', 'классический', 'постный', 'сытный', 'лёгкий',
+)
+STEPS = (
+    'нарезать', 'обжарить', 'потушить', 'запечь', 'смешать', 'посолить',
+    'добавить', 'варить', 'охладить', 'подавать', 'взбить', 'посыпать',
+)
+COUNTERS = (
+    ('recipes_recipe', 'favorites_count', 'recipes_favorite', 'recipe_id'),
+    ('recipes_recipe', 'carts_count', 'recipes_shopping', 'recipe_id'),
+    ('users_user', 'recipes_count', 'recipes_recipe', 'author_id'),
+    ('users_user', 'followers_count', 'users_subscribeauthor', 'author_id'),
+)
+
+
+def zipf_weights(rng, size, skew):
+    weights = 1 / np.arange(1, size + 1) ** skew
+    return rng.permutation(weights / weights.sum())
+
+
+def unique_pairs(rng, owners, per_owner, targets, weights):
+    """Уникальные пары (владелец, цель) с перекосом популярности целей."""
+    sizes = rng.poisson(per_owner, size=owners.size)
+    picked = rng.choice(targets.size, size=int(sizes.sum()), p=weights)
+    pairs = np.unique(
+        np.repeat(owners, sizes).astype(np.int64) * targets.size + picked
+    )
+    return pairs // targets.size, targets[pairs % targets.size]
+
+
+class Command(BaseCommand):
+    help = ('Детерминированная генерация больших объёмов синтетических '
+            'данных через COPY')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=10000, type=int)
+        parser.add_argument('--recipes', default=100000, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=8.0,
+                            type=float)
+        parser.add_argument('--tags-per-recipe', default=2, type=int)
+        parser.add_argument('--favorites-per-user', default=50.0, type=float)
+        parser.add_argument('--carts-per-user', default=10.0, type=float)
+        parser.add_argument('--follows-per-user', default=20.0, type=float)
+        parser.add_argument('--author-skew', default=1.1, type=float,
+                            help='Показатель Ципфа для авторов рецептов')
+        parser.add_argument('--follow-skew', default=1.2, type=float,
+                            help='Показатель Ципфа для числа подписчиков')
+        parser.add_argument('--recipe-skew', default=0.9, type=float,
+                            help='Показатель Ципфа для избранного/покупок')
+        parser.add_argument('--images', default=8, type=int,
+                            help='Число изображений-заглушек')
+        parser.add_argument('--prefix', default='synthetic')
+        parser.add_argument('--seed', default=0, type=int)
+
+    def rng(self, *key):
+        return np.random.default_rng([self.seed, *key])
+
+    def copy(self, model, columns, rows):
+        buffer = io.StringIO()
+        buffer.writelines('\t'.join(map(str, row)) + '\n' for row in rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {model._meta.db_table} ({", ".join(columns)}) '
+                f'FROM STDIN',
+                buffer
+            )
+        self.rows += buffer.getvalue().count('\n')
+
+    def progress(self, stage):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{stage}: строк {self.rows} за {elapsed:.1f} с '
+            f'({self.rows / max(elapsed, 1e-6):.0f} строк/с)'
+        )
+
+    @staticmethod
+    def next_id(model):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COALESCE(MAX(id), 0) + 1 FROM {model._meta.db_table}'
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def batches(total):
+        """Пачки по BLOCK_SIZE строк.
+
+        Каждая пачка пишется в своей транзакции: проверки внешних ключей
+        не копятся до конца генерации, а сбой откатывает только пачку.
+        """
+        for number, start in enumerate(range(0, total, BLOCK_SIZE)):
+            yield number, start, min(start + BLOCK_SIZE, total)
+
+    def placeholders(self, amount):
+        rng = self.rng(0)
+        names = []
+        for number in range(amount):
+            name = f'static/recipe/{self.prefix}_{number}.jpg'
+            if not default_storage.exists(name):
+                buffer = io.BytesIO()
+                Image.new(
+                    'RGB', (960, 640), tuple(rng.integers(0, 256, 3).tolist())
+                ).save(buffer, 'JPEG')
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names or ['']
+
+    def create_users(self, options):
+        first_id = self.next_id(User)
+        for number, start, stop in self.batches(options['users']):
+            with transaction.atomic():
+                self.copy(User, (
+                    'id', 'password', 'is_superuser', 'username',
+                    'first_name', 'last_name', 'email', 'is_staff',
+                    'is_active', 'date_joined', 'recipes_count',
+                    'followers_count',
+                ), (
+                    (first_id + i, '!', 'f', f'{self.prefix}_{i}', 'Имя',
+                     f'Фамилия {i}', f'{self.prefix}_{i}@example.com', 'f',
+                     't', 'now', 0, 0) for i in range(start, stop)
+                ))
+            self.progress(f'Пользователи {stop}')
+        return np.arange(first_id, first_id + options['users'])
+
+    def create_recipes(self, options, users, tags, ingredients, images):
+        first_id = self.next_id(Recipe)
+        author_weights = zipf_weights(self.rng(1), users.size,
+                                      options['author_skew'])
+        ingredient_weights = zipf_weights(self.rng(2), ingredients.size, 1.0)
+        for number, start, stop in self.batches(options['recipes']):
+            rng = self.rng(3, number)
+            ids = np.arange(first_id + start, first_id + stop)
+            authors = users[rng.choice(users.size, ids.size,
+                                       p=author_weights)]
+            recipe_tags = np.sort(np.array([
+                rng.choice(tags, options['tags_per_recipe'], replace=False)
+                for _ in ids
+            ]), axis=1)
+            words = rng.integers(0, len(WORDS), ids.size)
+            recipes = [
+                (recipe_id, author,
+                 f'{WORDS[word].capitalize()} рецепт {recipe_id}',
+                 ' '.join(STEPS[step] for step in rng.integers(
+                     0, len(STEPS), 12)),
+                 images[recipe_id % len(images)], '{}',
+                 int(rng.integers(1, 180)), 0, 0,
+                 '{' + ','.join(map(str, row_tags)) + '}', 't', 0)
+                for recipe_id, author, word, row_tags
+                in zip(ids, authors, words, recipe_tags)
+            ]
+            recipe_ids, ingredient_ids = unique_pairs(
+                rng, ids, options['ingredients_per_recipe'], ingredients,
+                ingredient_weights
+            )
+            amounts = rng.integers(1, 500, recipe_ids.size)
+            with transaction.atomic():
+                self.copy(Recipe, (
+                    'id', 'author_id', 'name', 'text', 'image',
+                    'image_renditions', 'cooking_time', 'favorites_count',
+                    'carts_count', 'tag_ids', 'similar_stale',
+                    'similar_version',
+                ), recipes)
+                self.copy(Recipe.tags.through, ('recipe_id', 'tag_id'), (
+                    (recipe_id, tag)
+                    for recipe_id, row_tags in zip(ids, recipe_tags)
+                    for tag in row_tags
+                ))
+                self.copy(RecipeIngredient,
+                          ('recipe_id', 'ingredient_id', 'amount'),
+                          zip(recipe_ids, ingredient_ids, amounts))
+            self.progress(f'Рецепты {stop}')
+        return np.arange(first_id, first_id + options['recipes'])
+
+    def create_relations(self, options, users, recipes):
+        recipe_weights = zipf_weights(self.rng(4), recipes.size,
+                                      options['recipe_skew'])
+        author_weights = zipf_weights(self.rng(5), users.size,
+                                      options['follow_skew'])
+        relations = (
+            (Favorite, ('user_id', 'recipe_id'), recipes, recipe_weights,
+             options['favorites_per_user']),
+            (Shopping, ('user_id', 'recipe_id'), recipes, recipe_weights,
+             options['carts_per_user']),
+            (SubscribeAuthor, ('user_id', 'author_id'), users,
+             author_weights, options['follows_per_user']),
+        )
+        for key, (model, columns, targets, weights, mean) in enumerate(
+            relations, start=6
+        ):
+            for number, start, stop in self.batches(users.size):
+                owners, picked = unique_pairs(
+                    self.rng(key, number), users[start:stop], mean, targets,
+                    weights
+                )
+                if model is SubscribeAuthor:
+                    itself = owners == picked
+                    owners, picked = owners[~itself], picked[~itself]
+                with transaction.atomic():
+                    self.copy(model, columns, zip(owners, picked))
+            self.progress(model._meta.verbose_name_plural)
+        for number, start, stop in self.batches(users.size):
+            with transaction.atomic():
+                rebuild(users[start:stop].tolist())
+        self.progress(ShoppingCartSummary._meta.verbose_name_plural)
+
+    @staticmethod
+    def finish():
+        models = (User, Recipe, Recipe.tags.through, RecipeIngredient,
+                  Favorite, Shopping, SubscribeAuthor)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+            for table, field, related, column in COUNTERS:
+                cursor.execute(
+                    f'UPDATE {table} SET {field} = counts.total FROM ('
+                    f'SELECT {column}, COUNT(*) AS total FROM {related} '
+                    f'GROUP BY {column}) AS counts '
+                    f'WHERE {table}.id = counts.{column}'
+                )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Генератор работает только с PostgreSQL')
+        tags = np.array(Tag.objects.values_list('id', flat=True))
+        ingredients = np.array(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        if tags.size < options['tags_per_recipe'] or not ingredients.size:
+            raise CommandError(
+                'Сначала загрузите теги и ингредиенты: '
+                'add_tags, add_ingredients'
+            )
+        self.seed = options['seed']
+        self.prefix = options['prefix']
+        self.rows = 0
+        self.started = time.monotonic()
+        images = self.placeholders(options['images'])
+        try:
+            users = self.create_users(options)
+            recipes = self.create_recipes(
+                options, users, np.sort(tags), ingredients, images
+            )
+            self.create_relations(options, users, recipes)
+        finally:
+            # Закоммиченные до сбоя пачки тоже получают последовательности,
+            # счётчики и сброс кэшей.
+            with transaction.atomic():
+                self.finish()
+            pantry_index.invalidate()
+            invalidate('recipes')
+        self.progress(self.style.SUCCESS('Готово'))
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', 'favorites'),
+    (Recipe, 'carts_count', 'shopping_cart'),
+    (User, 'recipes_count', 'recipe'),
+    (User, 'followers_count', 'following'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Сверка и исправление счётчиков избранного, покупок и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', default=1000, type=int)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения')
+
+    @staticmethod
+    def actual(model, relation):
+        """Подзапрос с числом связанных строк для каждой строки model."""
+        reverse = model._meta.get_field(relation)
+        field = reverse.field.name
+        return Coalesce(Subquery(
+            reverse.related_model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ), 0)
+
+    def recount(self, model, field, relation, options):
+        """Исправляет счётчики одним UPDATE на пачку.
+
+        Значение считается в том же запросе, что и записывается, поэтому
+        F()-приращение, закоммиченное между чтением и записью, не
+        затирается, как при bulk_update посчитанных заранее чисел.
+        """
+        last_id = model.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        actual = self.actual(model, relation)
+        fixed = 0
+        for start in range(0, last_id + 1, options['batch_size']):
+            drifted = model.objects.filter(
+                pk__gte=start, pk__lt=start + options['batch_size']
+            ).exclude(**{field: actual})
+            if options['dry_run']:
+                fixed += drifted.count()
+            else:
+                fixed += drifted.update(**{field: actual})
+        return fixed
+
+    def handle(self, *args, **options):
+        for model, field, relation in COUNTERS:
+            fixed = self.recount(model, field, relation, options)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'расхождений {fixed}'
+            )
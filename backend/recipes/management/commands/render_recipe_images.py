@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import update_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать уже готовые версии')
+
+    def handle(self, *args, **options):
+        rendered = 0
+        recipes = Recipe.objects.exclude(image='').exclude(image=None).only(
+            'id', 'image', 'image_renditions'
+        )
+        for recipe in recipes.iterator():
+            if not options['force'] and (
+                recipe.image_renditions.get('source') == recipe.image.name
+            ):
+                continue
+            try:
+                update_renditions(recipe.id)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Рецепт {recipe.id}: {error}')
+                continue
+            rendered += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {rendered}'
+        ))
@@ -0,0 +1,88 @@
+import csv
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.dispatch import Signal
+
+DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+
+# bulk_create не вызывает post_save: по этому сигналу сбрасываются кэши
+# и индексы загруженной модели.
+bulk_loaded = Signal()
+
+
+class BulkLoadCommand(BaseCommand):
+    """Потоковая загрузка CSV пачками через bulk_create."""
+
+    model = None
+    fields = ()
+    default_filename = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', default=self.default_filename,
+                            nargs='?', type=str)
+        parser.add_argument('--batch-size', default=1000, type=int)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только проверить файл, без записи в БД')
+
+    def build(self, row):
+        if len(row) != len(self.fields):
+            raise ValidationError(
+                f'ожидается колонок: {len(self.fields)}, получено: {len(row)}'
+            )
+        instance = self.model(
+            **dict(zip(self.fields, (value.strip() for value in row)))
+        )
+        instance.clean_fields()
+        return instance
+
+    def read(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line, row in enumerate(csv.reader(f), start=1):
+                try:
+                    yield self.build(row)
+                except ValidationError as error:
+                    self.errors += 1
+                    self.stderr.write(
+                        f'Строка {line}: {"; ".join(error.messages)}'
+                    )
+
+    def save(self, batch):
+        if not self.dry_run:
+            with transaction.atomic():
+                self.model.objects.bulk_create(batch, ignore_conflicts=True)
+        self.rows += len(batch)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'Обработано строк: {self.rows} '
+            f'({self.rows / max(elapsed, 1e-6):.0f} строк/с)'
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.join(DATA_ROOT, options['filename'])
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден')
+        self.dry_run = options['dry_run']
+        self.rows = self.errors = 0
+        self.started = time.monotonic()
+        created = self.model.objects.count()
+        batch = []
+        for instance in self.read(path):
+            batch.append(instance)
+            if len(batch) >= options['batch_size']:
+                self.save(batch)
+                batch = []
+        if batch:
+            self.save(batch)
+        created = self.model.objects.count() - created
+        if not self.dry_run:
+            bulk_loaded.send(sender=self.model)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: строк {self.rows}, добавлено {created}, '
+            f'с ошибками {self.errors}'
+            + (' (пробный запуск)' if self.dry_run else '')
+        ))
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:44
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Сливает ингредиенты с одинаковыми названием и единицей измерения.
+
+    Ссылки переводятся на ингредиент с наименьшим id; если в рецепте есть
+    оба, количества складываются.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.order_by().values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), count=Count('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        keep = duplicate.pop('keep')
+        del duplicate['count']
+        others = Ingredient.objects.filter(**duplicate).exclude(id=keep)
+        for row in RecipeIngredient.objects.filter(ingredient__in=others):
+            merged = RecipeIngredient.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=keep
+            ).update(amount=F('amount') + row.amount)
+            if merged:
+                row.delete()
+            else:
+                row.ingredient_id = keep
+                row.save(update_fields=('ingredient',))
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        # Отложенные проверки внешних ключей иначе запрещают ALTER TABLE.
+        migrations.RunSQL(
+            'SET CONSTRAINTS ALL IMMEDIATE', migrations.RunSQL.noop
+        ),
+        migrations.AlterModelOptions(
+            name='recipeingredient',
+            options={'ordering': ('-id',), 'verbose_name': 'Кол-во ингредиента', 'verbose_name_plural': 'Кол-во ингредиентов'},
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=200, verbose_name='Наименование ингредиента'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_measurement_unit'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:49
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+FILL_TAG_IDS = '''
+UPDATE recipes_recipe SET tag_ids = coalesce((
+    SELECT array_agg(tag_id ORDER BY tag_id)
+    FROM recipes_recipe_tags
+    WHERE recipe_id = recipes_recipe.id
+), '{}');
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None, verbose_name='Идентификаторы тегов'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='recipe_tag_ids'),
+        ),
+        migrations.RunSQL(FILL_TAG_IDS, migrations.RunSQL.noop),
+    ]
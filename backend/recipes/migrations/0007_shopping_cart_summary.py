@@ -0,0 +1,52 @@
+# Generated by Django 3.2.13 on 2026-10-18 19:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_summaries(apps, schema_editor):
+    summary_model = apps.get_model('recipes', 'ShoppingCartSummary')
+    summaries = {}
+    for user_id, recipe_id, ingredient_id, name, unit, amount in (
+        apps.get_model('recipes', 'RecipeIngredient').objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values_list(
+            'recipe__shopping_cart__user_id', 'recipe_id', 'ingredient_id',
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
+    ):
+        summary = summaries.setdefault(
+            user_id, summary_model(user_id=user_id, items={}, recipes={})
+        )
+        summary.recipes.setdefault(str(recipe_id), {})[
+            str(ingredient_id)
+        ] = amount
+        item = summary.items.setdefault(str(ingredient_id), {
+            'name': name, 'measurement_unit': unit, 'amount': 0
+        })
+        item['amount'] = round(item['amount'] + amount, 6)
+    summary_model.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+        ('recipes', '0006_recipe_tag_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shopping_cart_summary', serialize=False, to='users.user', verbose_name='Пользователь')),
+                ('items', models.JSONField(default=dict, editable=False, verbose_name='Ингредиенты')),
+                ('recipes', models.JSONField(default=dict, editable=False, verbose_name='Ингредиенты рецептов')),
+            ],
+            options={
+                'verbose_name': 'Сводный список покупок',
+                'verbose_name_plural': 'Сводные списки покупок',
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_shopping_cart_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='snapshot',
+            field=models.JSONField(editable=False, null=True, verbose_name='Готовое представление'),
+        ),
+    ]
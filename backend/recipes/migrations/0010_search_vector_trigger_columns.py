@@ -0,0 +1,22 @@
+from django.db import migrations
+
+TRIGGER = '''
+DROP TRIGGER recipes_recipe_search_vector_trigger ON recipes_recipe;
+CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE {columns}ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            TRIGGER.format(columns='OF name, text '),
+            TRIGGER.format(columns='')
+        ),
+    ]
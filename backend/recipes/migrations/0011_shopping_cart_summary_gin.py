@@ -0,0 +1,22 @@
+# Generated by Django 3.2.13 on 2026-10-18 19:49
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_search_vector_trigger_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shoppingcartsummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['recipes'], name='cart_summary_recipes'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcartsummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['items'], name='cart_summary_items'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_shopping_cart_summary_gin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='similar_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Номер изменения для похожих рецептов'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.db import models
 
@@ -23,6 +26,12 @@ class Ingredient(models.Model):
         ordering = ['-id']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_measurement_unit'
+            )
+        ]
 
 
 class Tag(models.Model):
@@ -51,6 +60,18 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -71,6 +92,12 @@ class Recipe(models.Model):
         blank=False,
         null=True
     )
+    image_renditions = models.JSONField(
+        'Версии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления, мин',
         validators=(
@@ -88,15 +115,67 @@ class Recipe(models.Model):
         Tag,
         verbose_name='Теги рецепта'
     )
+    favorites_count = models.PositiveIntegerField(
+        'Кол-во добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        'Кол-во добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+    tag_ids = ArrayField(
+        models.IntegerField(),
+        verbose_name='Идентификаторы тегов',
+        default=list,
+        blank=True,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    snapshot = models.JSONField(
+        'Готовое представление',
+        null=True,
+        editable=False
+    )
+    similar_stale = models.BooleanField(
+        'Похожие рецепты устарели',
+        default=True,
+        editable=False
+    )
+    similar_version = models.PositiveIntegerField(
+        'Номер изменения для похожих рецептов',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            GinIndex(fields=('search_vector',), name='recipe_search_vector'),
+            GinIndex(fields=('tag_ids',), name='recipe_tag_ids'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def get_image_url(self, rendition, image_format='jpeg'):
+        if not self.image:
+            return None
+        if self.image_renditions.get('source') == self.image.name:
+            name = self.image_renditions.get(rendition, {}).get(image_format)
+            if name:
+                return self.image.storage.url(name)
+        return self.image.url
+
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
@@ -131,6 +210,37 @@ class RecipeIngredient(models.Model):
         ]
 
 
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'), name='similar_recipe_score'
+            ),
+        ]
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -180,3 +290,43 @@ class Shopping(models.Model):
                 name='unique_cart_user_recipes'
             )
         ]
+
+
+class ShoppingCartSummary(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shopping_cart_summary',
+        verbose_name='Пользователь'
+    )
+    items = models.JSONField(
+        'Ингредиенты',
+        default=dict,
+        editable=False
+    )
+    recipes = models.JSONField(
+        'Ингредиенты рецептов',
+        default=dict,
+        editable=False
+    )
+
+    class Meta:
+        verbose_name = 'Сводный список покупок'
+        verbose_name_plural = 'Сводные списки покупок'
+        indexes = [
+            GinIndex(fields=('recipes',), name='cart_summary_recipes'),
+            GinIndex(fields=('items',), name='cart_summary_items'),
+        ]
+
+    def get_items(self):
+        return [
+            {
+                'name': item['name'],
+                'measurement_unit': item['measurement_unit'],
+                'amount': item['amount'],
+            }
+            for item in sorted(
+                self.items.values(), key=lambda item: item['name']
+            )
+        ]
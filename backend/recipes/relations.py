@@ -0,0 +1,122 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+# Пакетные изменения не вызывают post_save/post_delete для каждой строки:
+# обработчики этих сигналов обновляют счётчики и списки покупок разом.
+relations_added = Signal()
+relations_removed = Signal()
+
+ADD_SQL = (
+    'WITH target AS (SELECT {columns} FROM {target} WHERE id = %s), '
+    'added AS (INSERT INTO {table} (user_id, {column}) '
+    'SELECT %s, id FROM target ON CONFLICT DO NOTHING RETURNING 1) '
+    'SELECT EXISTS(SELECT 1 FROM added), {columns} FROM target'
+)
+REMOVE_SQL = (
+    'WITH target AS (SELECT id FROM {target} WHERE id = %s), '
+    'removed AS (DELETE FROM {table} WHERE user_id = %s '
+    'AND {column} IN (SELECT id FROM target) RETURNING 1) '
+    'SELECT EXISTS(SELECT 1 FROM removed) FROM target'
+)
+
+
+def change_counter(model, pks, field, delta):
+    """Сдвигает счётчик на delta, не опуская его ниже нуля."""
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def format_sql(sql, model, field, target_fields=()):
+    return sql.format(
+        table=model._meta.db_table,
+        column=model._meta.get_field(field).column,
+        target=model._meta.get_field(field).related_model._meta.db_table,
+        columns=', '.join(
+            connection.ops.quote_name(target_field.column)
+            for target_field in target_fields
+        ),
+    )
+
+
+@transaction.atomic
+def add_relation(model, user_id, field, pk, fields=('id',)):
+    """Связывает пользователя с объектом одним INSERT ... ON CONFLICT.
+
+    Возвращает (объект с полями fields, добавлена ли связь) или None,
+    если объекта нет.
+    """
+    target = model._meta.get_field(field).related_model
+    fields = [
+        target_field for target_field in target._meta.concrete_fields
+        if target_field.name in fields
+    ]
+    sql = format_sql(ADD_SQL, model, field, fields)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (pk, user_id))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    if row[0]:
+        relations_added.send(sender=model, user_id=user_id, ids=[pk])
+    values = [
+        target_field.from_db_value(value, None, connection)
+        if hasattr(target_field, 'from_db_value') else value
+        for target_field, value in zip(fields, row[1:])
+    ]
+    return target.from_db(
+        connection.alias,
+        [target_field.attname for target_field in fields],
+        values
+    ), row[0]
+
+
+@transaction.atomic
+def remove_relation(model, user_id, field, pk):
+    """Удаляет связь одним DELETE ... RETURNING.
+
+    Возвращает, была ли связь удалена, или None, если объекта нет.
+    """
+    sql = format_sql(REMOVE_SQL, model, field)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (pk, user_id))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    if row[0]:
+        relations_removed.send(sender=model, user_id=user_id, ids=[pk])
+    return row[0]
+
+
+@transaction.atomic
+def add_relations(model, user_id, field, ids):
+    column = model._meta.get_field(field).column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {model._meta.db_table} (user_id, {column}) '
+            f'SELECT %s, unnest(%s::integer[]) ON CONFLICT DO NOTHING '
+            f'RETURNING {column}',
+            (user_id, list(dict.fromkeys(ids)))
+        )
+        added = [pk for pk, in cursor.fetchall()]
+    if added:
+        relations_added.send(sender=model, user_id=user_id, ids=added)
+    return added
+
+
+@transaction.atomic
+def remove_relations(model, user_id, field, ids):
+    column = model._meta.get_field(field).column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {model._meta.db_table} '
+            f'WHERE user_id = %s AND {column} = ANY(%s) '
+            f'RETURNING {column}',
+            (user_id, list(ids))
+        )
+        removed = [pk for pk, in cursor.fetchall()]
+    if removed:
+        relations_removed.send(sender=model, user_id=user_id, ids=removed)
+    return removed
@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import RecipeIngredient, Shopping, ShoppingCartSummary
+
+BATCH_SIZE = 1000
+PRECISION = 6
+
+
+def get_contributions(recipe_ids):
+    contributions = {str(recipe_id): {} for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id, name, unit, amount in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        )
+    ):
+        contributions[str(recipe_id)][str(ingredient_id)] = {
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        }
+    return contributions
+
+
+def remove_recipe(summary, recipe_id):
+    for ingredient_id, amount in summary.recipes.pop(
+        str(recipe_id), {}
+    ).items():
+        item = summary.items.get(ingredient_id)
+        if item is None:
+            continue
+        item['amount'] = round(item['amount'] - amount, PRECISION)
+        if item['amount'] <= 0:
+            del summary.items[ingredient_id]
+
+
+def add_recipe(summary, recipe_id, contribution):
+    remove_recipe(summary, recipe_id)
+    summary.recipes[str(recipe_id)] = {
+        ingredient_id: item['amount']
+        for ingredient_id, item in contribution.items()
+    }
+    for ingredient_id, item in contribution.items():
+        amount = summary.items.get(ingredient_id, {}).get('amount', 0)
+        summary.items[ingredient_id] = {
+            **item, 'amount': round(amount + item['amount'], PRECISION)
+        }
+
+
+def get_shopping_list(user):
+    summary = ShoppingCartSummary.objects.filter(user=user).first()
+    return summary.get_items() if summary else []
+
+
+@transaction.atomic
+def add_to_cart(user_id, recipe_ids):
+    summary, _ = ShoppingCartSummary.objects.select_for_update(
+    ).get_or_create(user_id=user_id)
+    for recipe_id, contribution in get_contributions(recipe_ids).items():
+        add_recipe(summary, recipe_id, contribution)
+    summary.save()
+
+
+@transaction.atomic
+def remove_from_cart(user_id, recipe_ids):
+    summary = ShoppingCartSummary.objects.select_for_update().filter(
+        user_id=user_id
+    ).first()
+    if summary is not None:
+        for recipe_id in recipe_ids:
+            remove_recipe(summary, recipe_id)
+        summary.save()
+
+
+def update_summaries(lookup, change):
+    """Применяет change к заблокированным спискам, подходящим под lookup."""
+    with transaction.atomic():
+        summaries = []
+        for summary in ShoppingCartSummary.objects.select_for_update().filter(
+            **lookup
+        ).order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            change(summary)
+            summaries.append(summary)
+        ShoppingCartSummary.objects.bulk_update(
+            summaries, ('items', 'recipes'), batch_size=BATCH_SIZE
+        )
+
+
+def refresh_recipe(recipe_id):
+    contribution = get_contributions([recipe_id])[str(recipe_id)]
+    update_summaries(
+        {'recipes__has_key': str(recipe_id)},
+        lambda summary: add_recipe(summary, recipe_id, contribution)
+    )
+
+
+def rename_ingredient(ingredient):
+    def rename(summary):
+        summary.items[str(ingredient.pk)].update(
+            name=ingredient.name,
+            measurement_unit=ingredient.measurement_unit
+        )
+
+    update_summaries({'items__has_key': str(ingredient.pk)}, rename)
+
+
+@transaction.atomic
+def rebuild(user_ids):
+    carts = defaultdict(list)
+    for user_id, recipe_id in Shopping.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'recipe_id'):
+        carts[user_id].append(recipe_id)
+    contributions = get_contributions(
+        {recipe_id for recipes in carts.values() for recipe_id in recipes}
+    )
+    summaries = []
+    for user_id, recipes in carts.items():
+        summary = ShoppingCartSummary(user_id=user_id)
+        for recipe_id in recipes:
+            add_recipe(summary, recipe_id, contributions[str(recipe_id)])
+        summaries.append(summary)
+    ShoppingCartSummary.objects.filter(user_id__in=user_ids).delete()
+    ShoppingCartSummary.objects.bulk_create(summaries, batch_size=BATCH_SIZE)
@@ -0,0 +1,197 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F, Func, Value
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .images import schedule_renditions
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, Shopping,
+                     Tag)
+from .relations import change_counter, relations_added, relations_removed
+from .shopping_cart import (add_to_cart, refresh_recipe, remove_from_cart,
+                            rename_ingredient)
+from .transactions import on_commit_once
+
+User = get_user_model()
+
+SIMILAR_FEATURES = {
+    Recipe.tags.through: 'tags',
+    Recipe.ingredients.through: 'ingredients',
+}
+
+
+@receiver(post_save, sender=Recipe)
+def render_recipe_image(sender, instance, **kwargs):
+    if instance.image and (
+        instance.image_renditions.get('source') != instance.image.name
+    ):
+        schedule_renditions(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.author_id], 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    change_counter(User, [instance.author_id], 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def increase_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, [instance.recipe_id], 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrease_favorites_count(sender, instance, **kwargs):
+    change_counter(Recipe, [instance.recipe_id], 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Shopping)
+def increase_carts_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, [instance.recipe_id], 'carts_count', 1)
+
+
+@receiver(post_delete, sender=Shopping)
+def decrease_carts_count(sender, instance, **kwargs):
+    change_counter(Recipe, [instance.recipe_id], 'carts_count', -1)
+
+
+@receiver(post_save, sender=Shopping)
+def add_to_shopping_cart_summary(sender, instance, created, **kwargs):
+    if created:
+        add_to_cart(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=Shopping)
+def remove_from_shopping_cart_summary(sender, instance, **kwargs):
+    remove_from_cart(instance.user_id, [instance.recipe_id])
+
+
+@receiver(relations_added, sender=Favorite)
+def increase_favorites_count_batch(sender, ids, **kwargs):
+    change_counter(Recipe, ids, 'favorites_count', 1)
+
+
+@receiver(relations_removed, sender=Favorite)
+def decrease_favorites_count_batch(sender, ids, **kwargs):
+    change_counter(Recipe, ids, 'favorites_count', -1)
+
+
+@receiver(relations_added, sender=Shopping)
+def add_to_shopping_cart_batch(sender, user_id, ids, **kwargs):
+    change_counter(Recipe, ids, 'carts_count', 1)
+    add_to_cart(user_id, ids)
+
+
+@receiver(relations_removed, sender=Shopping)
+def remove_from_shopping_cart_batch(sender, user_id, ids, **kwargs):
+    change_counter(Recipe, ids, 'carts_count', -1)
+    remove_from_cart(user_id, ids)
+
+
+def schedule_refresh(recipe_ids):
+    for recipe_id in recipe_ids:
+        on_commit_once(refresh_recipe, recipe_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_shopping_cart_summaries(sender, instance, **kwargs):
+    schedule_refresh([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_shopping_cart_summaries_m2m(sender, instance, action, reverse,
+                                        pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_refresh([instance.pk])
+    elif pk_set:
+        schedule_refresh(pk_set)
+
+
+@receiver(post_save, sender=Ingredient)
+def rename_shopping_cart_ingredient(sender, instance, created, **kwargs):
+    if not created:
+        rename_ingredient(instance)
+
+
+def update_tag_ids(recipe_ids):
+    tag_ids = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag_id').values_list('recipe_id', 'tag_id'):
+        tag_ids[recipe_id].append(tag_id)
+    for recipe_id, ids in tag_ids.items():
+        Recipe.objects.filter(pk=recipe_id).update(tag_ids=ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def sync_tag_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        update_tag_ids([instance.pk])
+    elif action == 'post_clear':
+        Recipe.objects.filter(tag_ids__contains=[instance.pk]).update(
+            tag_ids=Func(F('tag_ids'), Value(instance.pk),
+                         function='array_remove')
+        )
+    else:
+        update_tag_ids(pk_set)
+
+
+@receiver(post_delete, sender=Tag)
+def remove_deleted_tag_id(sender, instance, **kwargs):
+    Recipe.objects.filter(tag_ids__contains=[instance.pk]).update(
+        tag_ids=Func(F('tag_ids'), Value(instance.pk), function='array_remove')
+    )
+
+
+def mark_similar_stale(queryset):
+    # Номер сдвигается и у уже помеченных рецептов: пересчёт, начатый до
+    # изменения, не снимет отметку (см. recipes.similarity.clear_stale).
+    queryset.update(
+        similar_stale=True, similar_version=F('similar_version') + 1
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def mark_similar_stale_ingredients(sender, instance, **kwargs):
+    mark_similar_stale(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+def mark_similar_stale_m2m(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            mark_similar_stale(Recipe.objects.filter(pk=instance.pk))
+    elif action in ('post_add', 'post_remove'):
+        mark_similar_stale(Recipe.objects.filter(pk__in=pk_set))
+    elif action == 'pre_clear':
+        mark_similar_stale(Recipe.objects.filter(
+            **{SIMILAR_FEATURES[sender]: instance}
+        ))
+
+
+for through in SIMILAR_FEATURES:
+    m2m_changed.connect(mark_similar_stale_m2m, sender=through)
+
+
+@receiver(pre_delete, sender=Recipe)
+def mark_similar_stale_neighbours(sender, instance, **kwargs):
+    mark_similar_stale(Recipe.objects.filter(
+        similar_recipes__similar=instance
+    ))
+
+
+@receiver(pre_delete, sender=Tag)
+def mark_similar_stale_tag(sender, instance, **kwargs):
+    mark_similar_stale(Recipe.objects.filter(tag_ids__contains=[instance.pk]))
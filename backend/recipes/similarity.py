@@ -0,0 +1,243 @@
+import io
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from .models import Recipe, RecipeIngredient, SimilarRecipe
+
+BLOCK_SIZE = 128
+DENSE_FEATURES = 128
+
+
+def concat_ranges(starts, lengths):
+    """Индексы отрезков [start, start + length), выписанные подряд."""
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + np.arange(lengths.sum()) - offsets
+
+
+def to_csr(rows, cols, size):
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return indptr, cols[order]
+
+
+class SimilarityMatrix:
+    """Разреженная матрица «рецепт × ингредиент/тег» с весами IDF.
+
+    Хранится CSR-массивами NumPy в обе стороны: строки рецептов дают
+    признаки запроса, столбцы признаков — рецепты-кандидаты. Самые частые
+    признаки (теги, соль) вынесены в плотную матрицу: их вклад считается
+    умножением матриц, а не обходом огромных списков рецептов. Сходство —
+    косинус взвешенных векторов.
+    """
+
+    def __init__(self):
+        self.recipe_ids = np.array(
+            Recipe.objects.order_by('id').values_list('id', flat=True),
+            dtype=np.int64
+        )
+        pairs = [
+            np.array(list(queryset.order_by().values_list(
+                'recipe_id', field
+            ).iterator()), dtype=np.int64).reshape(-1, 2).T
+            for queryset, field in (
+                (RecipeIngredient.objects, 'ingredient_id'),
+                (Recipe.tags.through.objects, 'tag_id'),
+            )
+        ]
+        rows, cols, offset = [], [], 0
+        for recipe_ids, feature_ids in pairs:
+            positions, known = self.locate(recipe_ids)
+            features, inverse = np.unique(
+                feature_ids[known], return_inverse=True
+            )
+            rows.append(positions[known])
+            cols.append(inverse + offset)
+            offset += features.size
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        size = self.recipe_ids.size
+        self.indptr, self.features = to_csr(rows, cols, size)
+        self.feature_indptr, self.recipes = to_csr(cols, rows, offset)
+        frequency = np.diff(self.feature_indptr)
+        self.weights = np.log((1 + size) / (1 + frequency)) + 1
+        self.norms = np.sqrt(np.bincount(
+            rows, weights=self.weights[cols] ** 2, minlength=size
+        ))
+        frequent = np.argsort(-frequency, kind='stable')[:DENSE_FEATURES]
+        self.is_dense = np.zeros(offset, dtype=bool)
+        self.is_dense[frequent] = True
+        columns = np.zeros(offset, dtype=np.int64)
+        columns[frequent] = np.arange(frequent.size)
+        dense = self.is_dense[cols]
+        self.dense = np.zeros((size, frequent.size), dtype=np.float32)
+        self.dense[rows[dense], columns[cols[dense]]] = (
+            self.weights[cols[dense]]
+        )
+
+    def locate(self, recipe_ids):
+        """Номера строк рецептов и маска тех, что есть в матрице."""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        if not self.recipe_ids.size:
+            return recipe_ids[:0], np.zeros(recipe_ids.size, dtype=bool)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids).clip(
+            max=self.recipe_ids.size - 1
+        )
+        return positions, self.recipe_ids[positions] == recipe_ids
+
+    def positions(self, recipe_ids):
+        positions, known = self.locate(sorted(recipe_ids))
+        return positions[known]
+
+    def scores(self, positions):
+        """Плотный блок сходства рецептов positions со всеми рецептами."""
+        size = self.recipe_ids.size
+        lengths = self.indptr[positions + 1] - self.indptr[positions]
+        features = self.features[
+            concat_ranges(self.indptr[positions], lengths)
+        ]
+        queries = np.repeat(np.arange(positions.size), lengths)
+        sparse = ~self.is_dense[features]
+        features, queries = features[sparse], queries[sparse]
+        counts = (
+            self.feature_indptr[features + 1] - self.feature_indptr[features]
+        )
+        candidates = self.recipes[
+            concat_ranges(self.feature_indptr[features], counts)
+        ]
+        scores = np.bincount(
+            np.repeat(queries, counts) * size + candidates,
+            weights=np.repeat(self.weights[features] ** 2, counts),
+            minlength=positions.size * size
+        ).astype(np.float64, copy=False).reshape(positions.size, size)
+        scores += self.dense[positions] @ self.dense.T
+        norms = np.outer(self.norms[positions], self.norms)
+        np.divide(scores, norms, out=scores, where=norms > 0)
+        scores[np.arange(positions.size), positions] = 0
+        return scores
+
+    def top(self, positions, scores, limit):
+        limit = min(limit, self.recipe_ids.size - 1)
+        if limit < 1:
+            return
+        best = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for position, similar, similar_scores in zip(
+            positions, best, best_scores
+        ):
+            recipe_id = self.recipe_ids[position]
+            for similar_position, score in zip(similar, similar_scores):
+                if score > 0:
+                    yield (recipe_id, self.recipe_ids[similar_position],
+                           float(score))
+
+    def blocks(self, positions):
+        for start in range(0, positions.size, BLOCK_SIZE):
+            block = positions[start:start + BLOCK_SIZE]
+            yield block, self.scores(block)
+
+
+def write(rows):
+    buffer = io.StringIO()
+    buffer.writelines(
+        f'{recipe_id}\t{similar_id}\t{score!r}\n'
+        for recipe_id, similar_id, score in rows
+    )
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {SimilarRecipe._meta.db_table} '
+            f'(recipe_id, similar_id, score) FROM STDIN',
+            buffer
+        )
+    return buffer.getvalue().count('\n')
+
+
+def stale_versions():
+    """Помеченные рецепты и номера их изменений до чтения матрицы."""
+    return dict(Recipe.objects.filter(
+        similar_stale=True
+    ).values_list('id', 'similar_version').iterator())
+
+
+def clear_stale(versions):
+    """Снимает отметки, не изменившиеся с момента stale_versions().
+
+    Изменение, закоммиченное во время пересчёта, сдвинуло similar_version:
+    такой рецепт останется помеченным до следующего запуска.
+    """
+    if not versions:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {Recipe._meta.db_table} AS recipe '
+            f'SET similar_stale = false '
+            f'FROM unnest(%s::integer[], %s::integer[]) AS seen(id, version) '
+            f'WHERE recipe.id = seen.id '
+            f'AND recipe.similar_version = seen.version',
+            [list(versions), list(versions.values())]
+        )
+
+
+def build_similar_recipes(limit):
+    """Полный пересчёт top-K похожих рецептов.
+
+    Отметки similar_stale снимаются в транзакции записи: если пересчёт
+    упадёт, изменённые рецепты останутся помеченными.
+    """
+    stale = stale_versions()
+    matrix = SimilarityMatrix()
+    positions = np.arange(matrix.recipe_ids.size)
+    with transaction.atomic():
+        clear_stale(stale)
+        SimilarRecipe.objects.all().delete()
+        return sum(
+            write(matrix.top(block, scores, limit))
+            for block, scores in matrix.blocks(positions)
+        )
+
+
+def refresh_similar_recipes(limit):
+    """Пересчёт для изменённых рецептов и тех, чьи списки они задевают.
+
+    Кроме самих изменённых рецептов пересчитываются рецепты, у которых
+    изменённый был в списке, и рецепты, у которых он теперь обходит
+    последнего соседа.
+    """
+    versions = stale_versions()
+    if not versions:
+        return 0
+    stale = list(versions)
+    matrix = SimilarityMatrix()
+    full = np.array(list(SimilarRecipe.objects.values_list(
+        'recipe_id'
+    ).annotate(
+        count=Count('id'), lowest=Min('score')
+    ).filter(count__gte=limit).values_list(
+        'recipe_id', 'lowest'
+    ).order_by().iterator())).reshape(-1, 2)
+    positions, known = matrix.locate(full[:, 0])
+    lowest = np.zeros(matrix.recipe_ids.size)
+    lowest[positions[known]] = full[known, 1]
+    affected = set(SimilarRecipe.objects.filter(
+        similar_id__in=stale
+    ).values_list('recipe_id', flat=True))
+    rows = []
+    for block, scores in matrix.blocks(matrix.positions(stale)):
+        affected.update(matrix.recipe_ids[
+            (scores > lowest).any(axis=0)
+        ].tolist())
+        rows.extend(matrix.top(block, scores, limit))
+    affected.difference_update(stale)
+    for block, scores in matrix.blocks(matrix.positions(affected)):
+        rows.extend(matrix.top(block, scores, limit))
+    with transaction.atomic():
+        clear_stale(versions)
+        SimilarRecipe.objects.filter(
+            recipe_id__in=affected.union(stale)
+        ).delete()
+        return write(rows)
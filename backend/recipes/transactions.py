@@ -0,0 +1,25 @@
+from django.db import transaction
+
+
+def on_commit_once(func, *args, using=None):
+    """transaction.on_commit с одним вызовом func(*args) на транзакцию.
+
+    Повторная регистрация пропускается, только если первая ещё не
+    выполнена и сделана в той же или во внешней точке сохранения: откат
+    вложенной отменил бы её.
+    """
+    key = (func, args)
+    connection = transaction.get_connection(using)
+    savepoints = set(connection.savepoint_ids)
+    if any(
+        getattr(callback, 'pending_key', None) == key and sids <= savepoints
+        for sids, callback in connection.run_on_commit
+    ):
+        return
+
+    def callback():
+        callback.pending_key = None
+        func(*args)
+
+    callback.pending_key = key
+    transaction.on_commit(callback, using)
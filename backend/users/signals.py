@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.relations import (change_counter, relations_added,
+                               relations_removed)
+
+from .models import SubscribeAuthor, User
+
+
+@receiver(post_save, sender=SubscribeAuthor)
+def increase_followers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.author_id], 'followers_count', 1)
+
+
+@receiver(post_delete, sender=SubscribeAuthor)
+def decrease_followers_count(sender, instance, **kwargs):
+    change_counter(User, [instance.author_id], 'followers_count', -1)
+
+
+@receiver(relations_added, sender=SubscribeAuthor)
+def increase_followers_count_batch(sender, ids, **kwargs):
+    change_counter(User, ids, 'followers_count', 1)
+
+
+@receiver(relations_removed, sender=SubscribeAuthor)
+def decrease_followers_count_batch(sender, ids, **kwargs):
+    change_counter(User, ids, 'followers_count', -1)
@@ -0,0 +1,34 @@
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = os.getenv(
+    'GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker'
+)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+max_requests = 1000
+max_requests_jitter = 100
+
+if worker_class.startswith('uvicorn'):
+    raw_env = ['ASYNC_VIEWS=True']
+
+
+def on_starting(server):
+    """Не даёт запустить несколько воркеров с кэшем внутри процесса.
+
+    Версии кэша ответов и отзыв токенов сбрасываются в общем кэше: с
+    LocMemCache остальные воркеры продолжили бы отдавать устаревшие данные.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+
+    backend = settings.CACHES['default']['BACKEND']
+    if server.cfg.workers > 1 and backend in settings.PROCESS_LOCAL_CACHES:
+        raise RuntimeError(
+            f'{backend} не разделяется между {server.cfg.workers} '
+            f'воркерами: задайте общий CACHE_BACKEND или GUNICORN_WORKERS=1'
+        )